@@ -0,0 +1,27 @@
+# app_loader.py
+# Loads the non-UI parts of app_v20.py (imports, constants, functions, classes) as a plain module,
+# so benchmarks, the load tester and tests can call the app's parsers and backends without a Streamlit run.
+
+import ast
+import os
+import types
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app_v20.py")
+
+
+def load_app_helpers(path=APP_FILE):
+    # app_v20.py is a Streamlit script: pull in only imports, constants, functions and classes
+    tree = ast.parse(open(path, encoding="utf-8").read())
+
+    def calls_ui(node):
+        return any(isinstance(n, ast.Call) and isinstance(n.func, ast.Attribute) and isinstance(n.func.value, ast.Name)
+                   and n.func.value.id in ("st", "components") and n.func.attr not in ("cache_data", "cache_resource")
+                   for n in ast.walk(node))
+
+    body = [n for n in tree.body
+            if isinstance(n, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef, ast.Try))
+            or (isinstance(n, ast.Assign) and not calls_ui(n))]
+    mod = types.ModuleType("app_helpers")
+    mod.__file__ = path
+    exec(compile(ast.Module(body=body, type_ignores=[]), path, "exec"), mod.__dict__)
+    return mod
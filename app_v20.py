@@ -3,26 +3,135 @@
 
 import streamlit as st
 import pandas as pd
+import numpy as np
 import io
 import re
 import pickle
 import os
 import random
 import time
+import html
+import hashlib
+import queue
+import socket
+import sqlite3
+import threading
+import atexit
+import sys
+import cProfile
+import marshal
+import urllib.parse
+import zipfile
+import abc
+import xml.etree.ElementTree as ET
+from collections import OrderedDict, Counter, deque
+from collections.abc import MutableMapping
 import streamlit.components.v1 as components
 
-# optional docx import
+# optional docx import (fallback only, .docx is normally streamed from the zip directly)
 try:
     from docx import Document
+    from docx.table import Table as DocxTable
+    from docx.text.paragraph import Paragraph as DocxParagraph
     DOCX_AVAILABLE = True
 except Exception:
     DOCX_AVAILABLE = False
 
+# POSIX file locks for the file backend's read-modify-write (Windows falls back to an in-process lock)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# optional Arrow support: event-log segments and Parquet / Arrow IPC export
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+    ARROW_AVAILABLE = True
+except Exception:
+    ARROW_AVAILABLE = False
+
 st.set_page_config(page_title="ZenMode Ultimate v2.0.0 (iter v22)", layout="wide",
                    page_icon="🌙", initial_sidebar_state="expanded")
 
-# --- CSS ---
-st.markdown("""
+# --- opt-in per-rerun profiler: ZEN_PROFILE=cprofile|sample, or hidden ?profile=1 / ?profile=sample ---
+PROFILE_MODE = os.environ.get("ZEN_PROFILE", "").lower()
+PROFILE_KEEP = int(os.environ.get("ZEN_PROFILE_KEEP", "20"))
+PROFILE_SAMPLE_INTERVAL = 0.005
+
+class SamplingProfiler:
+    """Samples the script thread's stack on a timer; exports collapsed stacks for flamegraph tools."""
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval, self.stacks = interval, Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="zen-sampler")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def export(self):
+        return "\n".join(f"{k} {v}" for k, v in self.stacks.most_common()).encode("utf-8")
+
+def start_run_profile():
+    # a run cut short by st.rerun() never reaches finish_run_profile(): close it here instead
+    finish_run_profile()
+    qp = st.experimental_get_query_params().get("profile")
+    if qp:
+        v = qp[0].lower()
+        # ?profile=0 / ?profile=off turns it back off for this session
+        st.session_state.profile_mode = "" if v in ("", "0", "off") else "sample" if v == "sample" else "cprofile"
+    mode = PROFILE_MODE or st.session_state.get("profile_mode", "")
+    if not mode or mode in ("0", "off"):
+        return
+    prof = SamplingProfiler() if mode == "sample" else cProfile.Profile()
+    st.session_state._run_profile = {"mode": "sample" if mode == "sample" else "cprofile", "prof": prof,
+                                     "label": "render", "ts": time.time(), "t0": time.perf_counter()}
+    prof.enable()
+
+def mark_action(label):
+    run = st.session_state.get("_run_profile")
+    if run:
+        run["label"] = label
+
+def finish_run_profile():
+    run = st.session_state.get("_run_profile")
+    if not run:
+        return
+    st.session_state._run_profile = None
+    prof = run["prof"]
+    prof.disable()
+    seconds = time.perf_counter() - run["t0"]
+    if run["mode"] == "sample":
+        data, ext = prof.export(), "collapsed"
+    else:
+        prof.create_stats()
+        data, ext = marshal.dumps(prof.stats), "pstats"  # same bytes as Profile.dump_stats()
+    ring = st.session_state.get("profiles")
+    if ring is None:
+        ring = st.session_state.profiles = deque(maxlen=PROFILE_KEEP)
+    ring.append({"label": run["label"], "ts": run["ts"], "seconds": seconds, "data": data, "ext": ext})
+
+start_run_profile()
+
+# --- CSS (minified once per process, it is re-sent on every rerun) ---
+APP_CSS = """
 <style>
     #MainMenu {visibility: hidden;}
     [data-testid="stHeader"] { background-color: rgba(0,0,0,0); }
@@ -58,7 +167,13 @@ st.markdown("""
 
     .small-meta { color:#9ca3af; font-size:13px; }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+@st.cache_resource(show_spinner=False)
+def minify_css(css):
+    return re.sub(r'\s*([{};:,>])\s*', r'\1', re.sub(r'\s+', ' ', css)).strip()
+
+st.markdown(minify_css(APP_CSS), unsafe_allow_html=True)
 
 # --- regex & parsing helpers (same approach as v21) ---
 RE_OPTS_1 = re.compile(r'(^|\s)([A-Z])[.、\)]:：]\s*(.*?)(?=\s+[A-Z][.、\)]:：]|$)', re.DOTALL | re.MULTILINE)
@@ -112,8 +227,52 @@ def extract_answer_from_text(text):
         return token.replace('.', '').upper()
     return ""
 
-# --- Excel / DOCX parsing (cached for excel) ---
-@st.cache_data(ttl=60*60, show_spinner=False)
+# --- answer normalization & batch grading ---
+ANSWER_TRUE = {"对", "TRUE", "T", "√", "正确", "是"}
+ANSWER_FALSE = {"错", "FALSE", "F", "×", "X", "错误", "否"}
+RE_OPTION_LETTERS = re.compile(r'[A-Z]+')
+
+def normalize_answer(raw, code=None):
+    s = normalize_text(raw).upper()
+    if not s: return ""
+    # 对/错 spellings only mean A/B for 判断题; on choice questions T, F and X are real option letters
+    if code == "AO" or (code not in ("BO", "CO") and not RE_OPTION_LETTERS.fullmatch(s)):
+        if s in ANSWER_TRUE: return "A"
+        if s in ANSWER_FALSE: return "B"
+    if code == "UNK": return s
+    letters = re.sub(r'[^A-Z]', '', s)
+    if code == "CO": return "".join(sorted(set(letters)))
+    return letters
+
+def build_answer_keys(qs):
+    # one normalized key per question, computed once per bank and reused by every grading pass
+    return np.array([normalize_answer(q.get("answer", ""), q.get("code")) for q in qs], dtype=object)
+
+def grade_batch(keys, codes, responses):
+    resp = np.array([normalize_answer(r, c) for r, c in zip(responses, codes)], dtype=object)
+    return (resp == keys) & (resp != ""), resp
+
+# --- lazy option parsing: options stay None until a question is first shown ---
+TYPE_NAMES = {'AO': '判断题', 'BO': '单选题', 'CO': '多选题', 'UNK': '未知'}
+LAZY_WARM = os.environ.get("ZEN_LAZY_WARM", "1") == "1"
+LAZY_WARM_MIN = 500
+
+def ensure_parsed(q):
+    if q.get("options") is None:
+        q_text, q_options = parse_options_from_text(q.get("raw_content", q.get("content", "")))
+        q["content"], q["options"] = q_text, q_options
+    return q
+
+def warm_options_async(qs):
+    # background pass so later questions are already parsed; only replaces values, never adds keys
+    if not LAZY_WARM or len(qs) < LAZY_WARM_MIN:
+        return
+    def run():
+        for q in qs:
+            ensure_parsed(q)
+    threading.Thread(target=run, daemon=True, name="zen-warm-options").start()
+
+# --- Excel / DOCX parsing (results cached on disk, see ParseCache) ---
 def parse_excel_bytes(file_bytes):
     try:
         df = pd.read_excel(io.BytesIO(file_bytes))
@@ -137,44 +296,136 @@ def parse_excel_bytes(file_bytes):
     df[col_content] = df[col_content].fillna("").astype(str)
     df[col_answer] = df[col_answer].fillna("").astype(str)
 
-    records = df.to_dict('records')
+    # type/answer columns are classified column-wise; option parsing is deferred to ensure_parsed()
+    raw_type = df[col_type].str.strip().str.upper()
+    codes = np.select([raw_type.str.contains('AO|判断'), raw_type.str.contains('BO|单选'), raw_type.str.contains('CO|多选')],
+                      ['AO', 'BO', 'CO'], 'UNK')
+    answers = df[col_answer].str.strip().str.upper()
     questions = []
-    for i, row in enumerate(records):
-        raw_type = normalize_text(row[col_type]).upper()
-        raw_content = row[col_content]
-        raw_answer = normalize_text(row[col_answer]).upper()
-        if any(x in raw_type for x in ['AO', '判断']): q_code, q_name = 'AO', '判断题'
-        elif any(x in raw_type for x in ['BO', '单选']): q_code, q_name = 'BO', '单选题'
-        elif any(x in raw_type for x in ['CO', '多选']): q_code, q_name = 'CO', '多选题'
-        else: q_code, q_name = 'UNK', '未知'
-        q_text, q_options = parse_options_from_text(raw_content)
-        if q_code in ['BO', 'CO'] and not q_options: q_options = {}
+    for i, (q_code, raw_content, raw_answer) in enumerate(zip(codes.tolist(), df[col_content].tolist(), answers.tolist())):
         questions.append({
-            "id": i, "code": q_code, "type": q_name,
-            "content": q_text, "options": q_options, "answer": raw_answer,
+            "id": i, "code": q_code, "type": TYPE_NAMES[q_code],
+            "content": raw_content, "options": None, "answer": raw_answer,
             "user_answer": None, "raw_content": raw_content
         })
     return questions
 
-def parse_docx_bytes(file_bytes):
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+RE_BLOCK_START = re.compile(r'^\d+[\.、\)]|^(题|Q|Question)', re.IGNORECASE)
+
+def iter_docx_texts(file_bytes):
+    # stream word/document.xml: yields non-empty paragraphs and table rows in document order;
+    # a row is its cells joined by newlines, nested tables fold into the enclosing cell
+    with zipfile.ZipFile(io.BytesIO(file_bytes)) as zf, zf.open("word/document.xml") as f:
+        paras, cells, rows = [], [], []
+        for event, el in ET.iterparse(f, events=("start", "end")):
+            tag = el.tag
+            if event == "start":
+                if tag == W_NS + "p": paras.append([])
+                elif tag == W_NS + "tc": cells.append([])
+                elif tag == W_NS + "tr": rows.append([])
+                continue
+            if tag == W_NS + "t":
+                if paras and el.text: paras[-1].append(el.text)
+            elif tag == W_NS + "tab":
+                if paras: paras[-1].append("\t")
+            elif tag in (W_NS + "br", W_NS + "cr"):
+                if paras: paras[-1].append("\n")
+            elif tag == W_NS + "p":
+                text = "".join(paras.pop()).strip()
+                if text:
+                    if cells: cells[-1].append(text)
+                    else: yield text
+                el.clear()
+            elif tag == W_NS + "tc":
+                text = "\n".join(cells.pop())
+                if rows and text: rows[-1].append(text)
+                el.clear()
+            elif tag == W_NS + "tr":
+                text = "\n".join(rows.pop())
+                if text:
+                    if cells: cells[-1].append(text)
+                    else: yield text
+                el.clear()
+
+def iter_docx_texts_pydocx(file_bytes):
+    # fallback for files the streaming reader cannot handle
     if not DOCX_AVAILABLE:
         raise RuntimeError("docx 解析依赖缺失，请安装 python-docx (pip install python-docx)")
     try:
         doc = Document(io.BytesIO(file_bytes))
     except Exception as e:
         raise RuntimeError(f"读取 docx 失败: {e}")
-    paras = [p.text.strip() for p in doc.paragraphs if p.text and p.text.strip()]
-    blocks, current = [], []
-    for t in paras:
-        if re.match(r'^\d+[\.、\)]', t) or re.match(r'^(题|Q|Question)', t, re.IGNORECASE):
-            if current: blocks.append("\n".join(current))
+    # walk the body in document order like the streaming reader, so questions split across a
+    # paragraph and a table keep their sequence
+    for child in doc.element.body.iterchildren():
+        if child.tag == W_NS + "p":
+            text = DocxParagraph(child, doc).text.strip()
+            if text:
+                yield text
+        elif child.tag == W_NS + "tbl":
+            for row in DocxTable(child, doc).rows:
+                text = "\n".join(c.text.strip() for c in row.cells if c.text.strip())
+                if text:
+                    yield text
+
+# answer-key appendix: "参考答案：1.A 2.BC 3.对 ..." after (or between) the question sections
+RE_KEY_HEADING = re.compile(r'^(?:[一二三四五六七八九十]+[、.．]\s*)?[【\[]?(?:参考答案|标准答案|答案)(?:及解析|与解析)?[】\]]?\s*[:：]?\s*')
+RE_KEY_PAIR = re.compile(r'(\d+)\s*[.、:：．]?\s*([A-Z]+|对|错|√|×)(?![A-Za-z\u4e00-\u9fff])')
+RE_KEY_FILLER = re.compile(r'[\s,，;；、.。]*')
+RE_LEADING_NUM = re.compile(r'^(\d+)')
+
+def parse_key_line(t):
+    # pairs if the whole line is "n.X" pairs, else None (a question stem that merely starts with a number)
+    pairs = RE_KEY_PAIR.findall(t)
+    if pairs and RE_KEY_FILLER.fullmatch(RE_KEY_PAIR.sub("", t)):
+        return pairs
+    return None
+
+def split_question_blocks(texts, answer_key=None):
+    # with answer_key (a dict), answer-key sections are consumed into number -> deque of answers
+    # in the same pass instead of being emitted as blocks; restarted numbering queues up per number
+    current, in_key, held = [], False, []
+    for t in texts:
+        if answer_key is not None:
+            m = RE_KEY_HEADING.match(t)
+            rest = t[m.end():] if m else ""
+            if m and (not rest or parse_key_line(rest)):
+                in_key, held, t = True, [t], rest
+                if not t: continue
+            if in_key:
+                pairs = parse_key_line(t)
+                if pairs:
+                    for n, a in pairs:
+                        answer_key.setdefault(int(n), deque()).append(normalize_answer(a))
+                    held = []
+                    continue
+                if held:
+                    # heading with no pairs after it was just a question's own "答案：" line
+                    current.extend(held)
+                    in_key, held = False, []
+                elif not RE_BLOCK_START.match(t):
+                    continue
+                in_key = False
+        if RE_BLOCK_START.match(t):
+            if current: yield "\n".join(current)
             current = [t]
         else:
             current.append(t)
-    if current: blocks.append("\n".join(current))
+    current.extend(held)
+    if current: yield "\n".join(current)
+
+def build_docx_questions(blocks, answer_key=None):
     questions = []
     for i, b in enumerate(blocks):
         ans = extract_answer_from_text(b)
+        if answer_key:
+            # always consume this number's key entry, even when the block answers inline, so restarted
+            # numbering in a later section lines up with the right entry
+            m = RE_LEADING_NUM.match(b)
+            if m and answer_key.get(int(m.group(1))):
+                keyed = answer_key[int(m.group(1))].popleft()
+                ans = ans or keyed
         q_text, q_options = parse_options_from_text(b)
         if '判断' in b or re.search(r'对|错|True|False', b, re.IGNORECASE):
             q_code, q_name = 'AO', '判断题'
@@ -192,45 +443,1415 @@ def parse_docx_bytes(file_bytes):
         })
     return questions
 
-# --- state persistence ---
+def parse_docx_bytes(file_bytes):
+    answer_key = {}
+    try:
+        blocks = list(split_question_blocks(iter_docx_texts(file_bytes), answer_key))
+    except (zipfile.BadZipFile, KeyError, ET.ParseError):
+        answer_key = {}
+        blocks = list(split_question_blocks(iter_docx_texts_pydocx(file_bytes), answer_key))
+    return build_docx_questions(blocks, answer_key)
+
+# --- persistent parse cache: sha256(parser version + bytes) -> questions, LRU by mtime ---
+PARSER_VERSION = "v22.4"  # bump whenever parsing output changes
+PARSE_CACHE_DIR = os.environ.get("ZEN_PARSE_CACHE_DIR", ".zen_parse_cache")
+PARSE_CACHE_MAX_BYTES = int(os.environ.get("ZEN_PARSE_CACHE_MB", "256")) * 1024 * 1024
+
+class ParseCache:
+    def __init__(self, path, max_bytes):
+        self.path, self.max_bytes = path, max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def key(self, kind, file_bytes):
+        h = hashlib.sha256(f"{PARSER_VERSION}:{kind}:".encode("utf-8"))
+        h.update(file_bytes)
+        return h.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".pkl")
+
+    def get(self, key):
+        fn = self._file(key)
+        try:
+            with open(fn, "rb") as f:
+                qs = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # truncated or from an incompatible build: drop it and re-parse
+            try: os.remove(fn)
+            except OSError: pass
+            return None
+        try: os.utime(fn)  # mtime is the LRU clock, shared by every worker
+        except OSError: pass
+        return qs
+
+    def put(self, key, questions):
+        fn = self._file(key)
+        tmp = f"{fn}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(questions, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, fn)
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for e in os.scandir(self.path):
+            if e.name.endswith(".pkl"):
+                try: st_ = e.stat()
+                except OSError: continue
+                entries.append((st_.st_mtime, st_.st_size, e.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes: break
+            try: os.remove(path)
+            except OSError: continue
+            total -= size
+
+@st.cache_resource(show_spinner=False)
+def get_parse_cache(path, max_bytes):
+    return ParseCache(path, max_bytes)
+
+def parse_file_cached(kind, file_bytes):
+    parser = {"excel": parse_excel_bytes, "docx": parse_docx_bytes}[kind]
+    try:
+        cache = get_parse_cache(PARSE_CACHE_DIR, PARSE_CACHE_MAX_BYTES)
+        key = cache.key(kind, file_bytes)
+        qs = cache.get(key)
+    except Exception:
+        cache = None
+        qs = None
+    if qs is None:
+        qs = parser(file_bytes)
+        if cache is not None:
+            try: cache.put(key, qs)
+            except Exception: pass
+    return qs
+
+# --- state persistence (pluggable backends: file / SQLite / Redis protocol) ---
 DATA_FILE = "user_data_v22.pkl"
-def save_state():
-    state = {
-        "banks": st.session_state.banks,
-        "progress": st.session_state.progress,
-        "active_bank": st.session_state.active_bank,
-        "filters": st.session_state.filters,
-        "favorites": st.session_state.favorites
-    }
+STATE_KEYS = ("banks", "progress", "active_bank", "filters", "favorites")
+STATE_DEFAULTS = {"progress": dict, "active_bank": lambda: None, "filters": dict, "favorites": list}
+# stored as "<part>:<bank>", so replicas sharing a backend only write the banks their own session changed
+PER_BANK_KEYS = ("progress", "filters")
+# e.g. file://user_data_v22 , sqlite:///data/zen.db , redis://:password@127.0.0.1:6379/0
+STATE_BACKEND_URL = os.environ.get("ZEN_STATE_BACKEND", "file://user_data_v22")
+
+class StateBackend(abc.ABC):
+    """Key/value store for pickled state parts; every write is one batched call."""
+    @abc.abstractmethod
+    def get_many(self, keys): ...
+
+    @abc.abstractmethod
+    def set_many(self, mapping): ...
+
+    @abc.abstractmethod
+    def delete_many(self, keys): ...
+
+    @abc.abstractmethod
+    def update(self, key, fn):
+        """atomically replace key with fn(current value or None); fn may be called more than once."""
+
+class FileBackend(StateBackend):
+    # one pickle per key, each replaced atomically
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _file(self, key):
+        return os.path.join(self.path, re.sub(r'[^\w.-]', lambda m: f"%{ord(m.group(0)):04x}", key) + ".pkl")
+
+    def get_many(self, keys):
+        out = {}
+        for k in keys:
+            try:
+                with open(self._file(k), "rb") as f:
+                    out[k] = pickle.load(f)
+            except FileNotFoundError:
+                pass
+        return out
+
+    def set_many(self, mapping):
+        for k, v in mapping.items():
+            fn = self._file(k)
+            tmp = f"{fn}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(v, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, fn)
+
+    def delete_many(self, keys):
+        for k in keys:
+            try:
+                os.remove(self._file(k))
+            except FileNotFoundError:
+                pass
+
+    def update(self, key, fn):
+        with self._lock, open(os.path.join(self.path, ".lock"), "ab") as lock:
+            if fcntl: fcntl.flock(lock, fcntl.LOCK_EX)  # released when the lock file is closed
+            value = fn(self.get_many([key]).get(key))
+            self.set_many({key: value})
+            return value
+
+class SQLiteBackend(StateBackend):
+    """WAL-mode SQLite; a bounded pool of connections shared by every script thread."""
+    def __init__(self, path, pool_size=4):
+        self.path = path
+        # Streamlit starts a fresh ScriptRunner thread per interaction, so per-thread connections
+        # would be reopened on every rerun; pooled ones are opened once and reused
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._run(lambda conn: conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB NOT NULL)"))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _run(self, fn):
+        # one transaction per call; a connection is only ever used by one thread at a time
+        conn = self._acquire()
+        try:
+            with conn:
+                return fn(conn)
+        finally:
+            self._release(conn)
+
+    def get_many(self, keys):
+        keys = list(keys)
+        rows = self._run(lambda conn: conn.execute(f"SELECT key, value FROM state WHERE key IN ({','.join('?' * len(keys))})", keys).fetchall())
+        return {k: pickle.loads(v) for k, v in rows}
+
+    def set_many(self, mapping):
+        rows = [(k, pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)) for k, v in mapping.items()]
+        self._run(lambda conn: conn.executemany("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", rows))
+
+    def delete_many(self, keys):
+        self._run(lambda conn: conn.executemany("DELETE FROM state WHERE key = ?", [(k,) for k in keys]))
+
+    def update(self, key, fn):
+        def txn(conn):
+            conn.execute("BEGIN IMMEDIATE")  # takes the write lock before reading
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+            value = fn(pickle.loads(row[0]) if row else None)
+            conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                         (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+            return value
+        return self._run(txn)
+
+class RedisBackend(StateBackend):
+    """Minimal RESP2 client: pooled connections, every batch sent as one pipeline."""
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, prefix="zen:", pool_size=8, timeout=5.0):
+        self.addr, self.db, self.password, self.prefix, self.timeout = (host, port), db, password, prefix, timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self):
+        sock = socket.create_connection(self.addr, timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        setup = ([["AUTH", self.password]] if self.password else []) + ([["SELECT", str(self.db)]] if self.db else [])
+        if setup:
+            self._pipeline(conn, setup)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn[0].close()
+
+    @staticmethod
+    def _encode(args):
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            a = a if isinstance(a, bytes) else str(a).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(a), a))
+        return b"".join(out)
+
+    def _read_reply(self, rf):
+        line = rf.readline()
+        if not line:
+            raise ConnectionError("redis connection closed")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+": return body.decode()
+        if kind == b"-": raise RuntimeError(body.decode())
+        if kind == b":": return int(body)
+        if kind == b"$":
+            n = int(body)
+            if n < 0: return None
+            data = rf.read(n + 2)
+            return data[:-2]
+        if kind == b"*":
+            n = int(body)
+            return None if n < 0 else [self._read_reply(rf) for _ in range(n)]
+        raise ConnectionError(f"bad redis reply: {line!r}")
+
+    def _pipeline(self, conn, commands):
+        sock, rf = conn
+        sock.sendall(b"".join(self._encode(c) for c in commands))
+        return [self._read_reply(rf) for _ in commands]
+
+    def _run(self, commands):
+        conn = self._acquire()
+        try:
+            replies = self._pipeline(conn, commands)
+        except Exception:
+            conn[0].close()
+            raise
+        self._release(conn)
+        return replies
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys: return {}
+        values = self._run([["MGET"] + [self.prefix + k for k in keys]])[0]
+        return {k: pickle.loads(v) for k, v in zip(keys, values) if v is not None}
+
+    def set_many(self, mapping):
+        if mapping:
+            self._run([["SET", self.prefix + k, pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)] for k, v in mapping.items()])
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if keys:
+            self._run([["DEL"] + [self.prefix + k for k in keys]])
+
+    def update(self, key, fn, retries=50):
+        # optimistic WATCH / MULTI / EXEC: EXEC answers nil when another client wrote the key in between
+        k = self.prefix + key
+        conn = self._acquire()
+        try:
+            for attempt in range(retries):
+                raw = self._pipeline(conn, [["WATCH", k], ["GET", k]])[1]
+                value = fn(pickle.loads(raw) if raw is not None else None)
+                if self._pipeline(conn, [["MULTI"], ["SET", k, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)], ["EXEC"]])[-1] is not None:
+                    break
+                # jittered backoff so writers racing on one key don't keep colliding in lockstep
+                time.sleep(random.uniform(0, 0.001 * (attempt + 1)))
+            else:
+                raise RuntimeError(f"redis: {key} kept changing, gave up after {retries} tries")
+        except Exception:
+            conn[0].close()
+            raise
+        self._release(conn)
+        return value
+
+def make_state_backend(url):
+    u = urllib.parse.urlparse(url)
+    if u.scheme == "sqlite":
+        return SQLiteBackend((u.netloc + u.path) or "zen_state.db")
+    if u.scheme == "redis":
+        return RedisBackend(u.hostname or "127.0.0.1", u.port or 6379, int(u.path.strip("/") or 0),
+                            urllib.parse.unquote(u.password) if u.password else None)
+    if u.scheme in ("", "file"):
+        return FileBackend((u.netloc + u.path) or "user_data_v22")
+    raise RuntimeError(f"未知的状态存储: {url}")
+
+@st.cache_resource(show_spinner=False)
+def get_state_backend(url):
+    return make_state_backend(url)
+
+# --- bank manager: LRU of resident banks under a memory budget, the rest live in the backend ---
+BANK_MEM_BUDGET = int(float(os.environ.get("ZEN_BANK_MEM_MB", "200")) * 1024 * 1024)
+BANK_INDEX_KEY = "bank_index"
+
+def estimate_bank_bytes(qs):
+    total = sys.getsizeof(qs)
+    for q in qs:
+        total += sys.getsizeof(q) + sum(sys.getsizeof(v) for v in q.values())
+        opts = q.get("options")
+        if opts:
+            total += sum(sys.getsizeof(v) for v in opts.values())
+    return total
+
+class BankManager(MutableMapping):
+    """dict-like view over all banks; only recently used ones stay in memory."""
+    def __init__(self, backend, budget=BANK_MEM_BUDGET, names=(), on_drop=None):
+        # on_drop(name) runs when a bank leaves memory (evicted or deleted), so callers can drop caches holding it
+        self._backend, self.budget, self.on_drop = backend, budget, on_drop
+        self._names = list(names)
+        self._resident = OrderedDict()
+        self._sizes, self._dirty, self._deleted = {}, set(), set()
+        self._added = []  # names added since the last save, merged into the stored index
+        self.hits = self.misses = self.evictions = 0
+
+    @staticmethod
+    def _key(name):
+        return f"bank:{name}"
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        if name in self._resident:
+            self.hits += 1
+            self._resident.move_to_end(name)
+            return self._resident[name]
+        self.misses += 1
+        qs = self._backend.get_many([self._key(name)]).get(self._key(name), [])
+        self._admit(name, qs)
+        return qs
+
+    def __setitem__(self, name, qs):
+        if name not in self._names:
+            self._names.append(name); self._added.append(name)
+        self._deleted.discard(name)
+        self._dirty.add(name)
+        self._admit(name, qs)
+
+    def __delitem__(self, name):
+        self._names.remove(name)
+        self._resident.pop(name, None); self._sizes.pop(name, None)
+        self._dirty.discard(name); self._deleted.add(name)
+        if name in self._added: self._added.remove(name)
+        if self.on_drop: self.on_drop(name)
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._names
+
+    def _admit(self, name, qs):
+        self._resident[name] = qs
+        self._resident.move_to_end(name)
+        self._sizes[name] = estimate_bank_bytes(qs)
+        # the bank just touched always stays, even if it alone exceeds the budget
+        while len(self._resident) > 1 and self.resident_bytes() > self.budget:
+            old, old_qs = next(iter(self._resident.items()))
+            if old in self._dirty:
+                self._backend.set_many({self._key(old): old_qs})
+                self._dirty.discard(old)
+            del self._resident[old]; self._sizes.pop(old, None)
+            self.evictions += 1
+            if self.on_drop: self.on_drop(old)
+
+    def resident_bytes(self):
+        return sum(self._sizes.values())
+
+    def pending_writes(self):
+        data = {self._key(n): self._resident[n] for n in self._dirty if n in self._resident}
+        return data, [self._key(n) for n in self._deleted]
+
+    def index_dirty(self):
+        return bool(self._added or self._deleted)
+
+    def sync_index(self):
+        # read-merge-write: apply this session's adds and deletes to the stored index instead of
+        # overwriting it with our snapshot, so concurrent imports from other sessions survive
+        added, deleted = list(self._added), set(self._deleted)
+        def merge(stored):
+            names = [n for n in (stored or []) if n not in deleted]
+            return names + [n for n in added if n not in names]
+        self._names = list(self._backend.update(BANK_INDEX_KEY, merge))
+
+    def mark_clean(self):
+        self._dirty.clear(); self._deleted.clear(); self._added.clear()
+
+    def metrics(self):
+        return {"banks": len(self._names), "resident": len(self._resident), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "resident_bytes": self.resident_bytes(), "budget": self.budget}
+
+def state_digest(v):
+    return hashlib.sha1(pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)).digest()
+
+def per_bank_writes(part, bank=None):
+    # per-bank values that changed since this session last loaded or saved them, and banks that went away;
+    # a named bank is the only one digested, so an answer costs the same however many banks there are
+    current = getattr(st.session_state, part)
+    saved = st.session_state.setdefault("saved_digests", {}).get(part, {})
+    names = list(current) if bank is None else [bank] if bank in current else []
+    digests = {bk: state_digest(current[bk]) for bk in names}
+    data = {f"{part}:{bk}": current[bk] for bk, d in digests.items() if saved.get(bk) != d}
+    removed = [f"{part}:{bk}" for bk in saved if bk not in current] if bank is None else []
+    return data, removed, digests
+
+def save_state(*keys, bank=None):
+    # callers pass only the parts they touched so a submit writes progress, not every bank;
+    # bank= limits progress / filters to the one bank they changed
+    keys = keys or STATE_KEYS
     try:
-        with open(DATA_FILE, "wb") as f:
-            pickle.dump(state, f)
+        backend = get_state_backend(STATE_BACKEND_URL)
+        data, removed, digests = {}, [], {}
+        for k in keys:
+            if k == "banks":
+                data_b, removed_b = st.session_state.banks.pending_writes()
+                data.update(data_b); removed += removed_b
+            elif k in PER_BANK_KEYS:
+                data_k, removed_k, digests[k] = per_bank_writes(k, bank)
+                data.update(data_k); removed += removed_k
+            else:
+                data[k] = getattr(st.session_state, k)
+        backend.set_many(data)
+        if "banks" in keys:
+            # bank data first, then the index, then deletions: the index never names a missing bank
+            if st.session_state.banks.index_dirty():
+                st.session_state.banks.sync_index()
+        if removed:
+            backend.delete_many(removed)
+        if "banks" in keys:
+            st.session_state.banks.mark_clean()
+        saved = st.session_state.setdefault("saved_digests", {})
+        for k, d in digests.items():
+            if bank is None: saved[k] = d
+            else: saved.setdefault(k, {}).update(d)
     except Exception:
         pass
 
 def load_state():
-    if os.path.exists(DATA_FILE):
-        try:
+    try:
+        backend = get_state_backend(STATE_BACKEND_URL)
+        state = backend.get_many((BANK_INDEX_KEY,) + STATE_KEYS)
+        if not state and os.path.exists(DATA_FILE):
+            # one-off migration of the single-pickle file used before pluggable backends
             with open(DATA_FILE, "rb") as f:
-                state = pickle.load(f)
-                st.session_state.banks = state.get("banks", {})
-                st.session_state.progress = state.get("progress", {})
-                st.session_state.active_bank = state.get("active_bank", None)
-                st.session_state.filters = state.get("filters", {})
-                st.session_state.favorites = state.get("favorites", [])
-                return True
+                state = {k: v for k, v in pickle.load(f).items() if k in STATE_KEYS}
+    except Exception:
+        return False
+    if not state:
+        return False
+    banks = BankManager(backend, names=state.get(BANK_INDEX_KEY, []), on_drop=forget_bank_views)
+    if "banks" in state and BANK_INDEX_KEY not in state:
+        # older layouts kept every bank under one key: split them into per-bank keys
+        for name, qs in state["banks"].items():
+            banks[name] = qs
+    st.session_state.banks = banks
+    names = list(banks.keys())
+    try:
+        per_bank = backend.get_many([f"{k}:{n}" for k in PER_BANK_KEYS for n in names]) if names else {}
+    except Exception:
+        per_bank = {}
+    saved = st.session_state.setdefault("saved_digests", {})
+    for k in STATE_KEYS:
+        if k == "banks":
+            continue
+        value = state.get(k, STATE_DEFAULTS[k]())
+        if k in PER_BANK_KEYS:
+            # older layouts stored the whole dict under one key; per-bank keys win where both exist
+            value.update({n: per_bank[f"{k}:{n}"] for n in names if f"{k}:{n}" in per_bank})
+            saved[k] = {n: state_digest(per_bank[f"{k}:{n}"]) for n in names if f"{k}:{n}" in per_bank}
+        setattr(st.session_state, k, value)
+    legacy = [k for k in PER_BANK_KEYS if k in state]
+    if any(banks.pending_writes()) or banks.index_dirty() or legacy:
+        save_state()
+        try: backend.delete_many(["banks"] + legacy)
+        except Exception: pass
+    return True
+
+# --- incremental re-import: diff a re-parsed file against an existing bank ---
+def diff_bank(old_qs, new_qs):
+    # unchanged rows are matched by fingerprint; leftovers in the same gap between
+    # matched rows are paired as edits, the rest are adds/deletes
+    by_fp = {}
+    for i, q in enumerate(old_qs):
+        by_fp.setdefault(question_fingerprint(q), []).append(i)
+    for lst in by_fp.values():
+        lst.reverse()
+    merged, matched, pending = [], [False] * len(old_qs), []
+    anchor = -1
+    for nq in new_qs:
+        lst = by_fp.get(question_fingerprint(nq))
+        if lst:
+            i = lst.pop(); matched[i] = True; anchor = i
+            merged.append(old_qs[i])
+        else:
+            pending.append((len(merged), anchor, nq)); merged.append(None)
+    gaps, anchor = {}, -1
+    for i, ok in enumerate(matched):
+        if ok: anchor = i
+        else: gaps.setdefault(anchor, []).append(i)
+    for g in gaps.values():
+        g.reverse()
+    next_id = max((q.get("id", -1) for q in old_qs), default=-1) + 1
+    added = updated = 0
+    for pos, anc, nq in pending:
+        g = gaps.get(anc)
+        if g:
+            nq["id"] = old_qs[g.pop()].get("id"); updated += 1
+        else:
+            nq["id"] = next_id; next_id += 1; added += 1
+        merged[pos] = nq
+    kept = {old_qs[i].get("id") for i, ok in enumerate(matched) if ok}
+    report = {"added": added, "updated": updated, "deleted": sum(len(g) for g in gaps.values()), "unchanged": len(kept)}
+    return merged, kept, report
+
+def sync_bank(bk, new_qs):
+    old_qs = st.session_state.banks.get(bk, [])
+    merged, kept, report = diff_bank(old_qs, new_qs)
+    pg = progress_for(bk, old_qs)
+    old_filters = st.session_state.filters.get(bk) or list({q['type'] for q in old_qs})
+    new_types = {q['type'] for q in merged}
+    filters = [t for t in old_filters if t in new_types] or list(new_types)
+    # answers survive only for unchanged questions; an edited question keeps its id but starts fresh
+    pg["history"] = {qid: a for qid, a in pg.get("history", {}).items() if qid in kept}
+    cur = pg.get("current_id")
+    live_ids = {q.get("id") for q in merged}
+    if cur is not None and cur not in live_ids:
+        # current question was deleted: continue at the next surviving one in the old order
+        old_ids = [q.get("id") for q in old_qs]
+        start = old_ids.index(cur) if cur in old_ids else len(old_ids)
+        pg["current_id"] = next((qid for qid in old_ids[start:] if qid in live_ids), None)
+        if pg["current_id"] is None:
+            pg["done"] = False
+    live = {q.get("raw_content") for q in merged}
+    pg["wrong"] = [w for w in pg.get("wrong", []) if w.get("raw_content") in live]
+    st.session_state.banks[bk] = merged
+    st.session_state.filters[bk] = filters
+    save_state("banks", "progress", "filters", bank=bk)
+    return report
+
+# --- per-question render cache (escaped HTML + option labels) ---
+RENDER_CACHE_SIZE = 256
+RENDER_PREFETCH = 3
+
+def question_fingerprint(q):
+    fp = q.get("fp")
+    if not fp:
+        raw = f"{q.get('code')}\x1f{q.get('raw_content', q.get('content', ''))}\x1f{q.get('answer', '')}"
+        fp = q["fp"] = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+    return fp
+
+def render_question(q):
+    cache = st.session_state.setdefault("render_cache", OrderedDict())
+    fp = question_fingerprint(q)
+    entry = cache.get(fp)
+    if entry is not None:
+        cache.move_to_end(fp)
+        return entry
+    ensure_parsed(q)
+    opts = q.get("options") or {}
+    type_html = html.escape(str(q.get("type", "")))
+    content_html = html.escape(str(q.get("content", ""))).replace("\n", "<br>")
+    entry = cache[fp] = {
+        "type": type_html, "content": content_html,
+        "card": f'<div class="zen-card"><span class="tag">{type_html}</span><div class="question-text">{content_html}</div></div>',
+        "keys": list(opts.keys()), "labels": [f"{k}. {v}" for k, v in opts.items()]
+    }
+    if len(cache) > RENDER_CACHE_SIZE:
+        cache.popitem(last=False)
+    return entry
+
+def prefetch_render(qs, start, n=RENDER_PREFETCH):
+    for q in qs[start:start + n]:
+        render_question(q)
+
+# --- answer widgets (shared by practice and exam mode) ---
+def render_answer_input(q, key, saved=None, allow_empty=False):
+    ensure_parsed(q)
+    code = q.get("code")
+    if code == "AO":
+        sel_idx = None if (allow_empty and saved not in ("A", "B")) else (1 if saved == "B" else 0)
+        return st.radio("判断:", ["A", "B"], index=sel_idx, format_func=lambda x: "✅ 正确" if x=='A' else "❌ 错误", horizontal=True, key=key)
+    if code == "BO" and q.get("options"):
+        rq = render_question(q); keys, disp = rq["keys"], rq["labels"]
+        sel_idx = keys.index(saved) if saved in keys else (None if allow_empty else 0)
+        val = st.radio("选择:", disp, index=sel_idx, key=key)
+        return val.split(".")[0] if val else None
+    if code == "CO":
+        st.write("多项选择：")
+        if q.get("options"):
+            rq = render_question(q); sel_list = []
+            for k, label in zip(rq["keys"], rq["labels"]):
+                checked = (k in saved) if saved else False
+                if st.checkbox(label, value=checked, key=f"{key}_{k}"):
+                    sel_list.append(k)
+            return "".join(sorted(sel_list)) if sel_list else ""
+    if code in ("BO", "CO"):
+        return st.text_input("答案：", value=saved or "", key=f"{key}_text").strip().upper()
+    return st.text_input("答案（自由）：", value=saved or "", key=f"{key}_text").strip()
+
+# --- answer event log: append-only columnar segments, one row per answer, shared by all sessions ---
+EVENT_LOG_DIR = os.environ.get("ZEN_EVENT_LOG_DIR", "zen_events")
+EVENT_FLUSH_ROWS = int(os.environ.get("ZEN_EVENT_FLUSH_ROWS", "500"))
+EVENT_FLUSH_SECONDS = 30
+EVENT_COLUMNS = ("ts", "bank", "fp", "choice", "correct", "latency", "session")
+
+class EventLog:
+    """rows are buffered column-wise and written as immutable segment files (.arrow, or .npz without pyarrow)."""
+    def __init__(self, path, flush_rows=EVENT_FLUSH_ROWS):
+        self.path, self.flush_rows = path, flush_rows
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._cols = {c: [] for c in EVENT_COLUMNS}
+        self._last_flush, self._seq = time.time(), 0
+        self.appended = 0
+
+    def append(self, ts, bank, fp, choice, correct, latency, session):
+        with self._lock:
+            for c, v in zip(EVENT_COLUMNS, (ts, bank, fp, choice, correct, latency, session)):
+                self._cols[c].append(v)
+            self.appended += 1
+            if len(self._cols["ts"]) >= self.flush_rows or time.time() - self._last_flush > EVENT_FLUSH_SECONDS:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.time()
+        if not self._cols["ts"]:
+            return
+        cols = self._columns(self._cols)
+        self._seq += 1
+        # sortable names: segments read back in write order, and workers never collide
+        name = f"{time.strftime('%Y%m%d%H%M%S')}_{os.getpid()}_{threading.get_ident()}_{self._seq:06d}"
+        fn = os.path.join(self.path, name + (".arrow" if ARROW_AVAILABLE else ".npz"))
+        try:
+            if ARROW_AVAILABLE:
+                table = pa.table(cols)
+                with pa.OSFile(fn + ".tmp", "wb") as sink, pa.ipc.new_file(sink, table.schema) as w:
+                    w.write_table(table)
+            else:
+                with open(fn + ".tmp", "wb") as f:
+                    np.savez(f, **cols)
+            os.replace(fn + ".tmp", fn)
         except Exception:
-            pass
+            # keep the rows buffered for the next flush instead of dropping them with the half-written segment
+            try: os.remove(fn + ".tmp")
+            except OSError: pass
+            raise
+        self._cols = {c: [] for c in EVENT_COLUMNS}
+
+    @staticmethod
+    def _columns(raw):
+        return {
+            "ts": np.asarray(raw["ts"], dtype=np.float64),
+            "bank": np.asarray(raw["bank"], dtype=str), "fp": np.asarray(raw["fp"], dtype=str),
+            "choice": np.asarray(raw["choice"], dtype=str), "correct": np.asarray(raw["correct"], dtype=bool),
+            "latency": np.asarray(raw["latency"], dtype=np.float32), "session": np.asarray(raw["session"], dtype=str),
+        }
+
+    def segments(self):
+        return sorted(e.path for e in os.scandir(self.path) if e.name.endswith((".arrow", ".npz")))
+
+    def read_columns(self):
+        # every flushed event as one numpy array per column
+        self.flush()
+        parts = []
+        for fn in self.segments():
+            try:
+                if fn.endswith(".arrow"):
+                    if not ARROW_AVAILABLE: continue
+                    with pa.memory_map(fn) as src:
+                        t = pa.ipc.open_file(src).read_all()
+                    parts.append({c: t.column(c).to_numpy(zero_copy_only=False) for c in EVENT_COLUMNS})
+                else:
+                    with np.load(fn, allow_pickle=False) as z:
+                        parts.append({c: z[c] for c in EVENT_COLUMNS})
+            except Exception:
+                continue  # unreadable segment (e.g. disk full mid-write): skip it, the rest stay usable
+        if not parts:
+            return self._columns({c: [] for c in EVENT_COLUMNS})
+        cols = {c: np.concatenate([p[c] for p in parts]) for c in EVENT_COLUMNS}
+        for c in ("bank", "fp", "choice", "session"):
+            cols[c] = cols[c].astype(str)
+        return cols
+
+    def export(self, fmt):
+        if not ARROW_AVAILABLE:
+            raise RuntimeError("导出需要 pyarrow (pip install pyarrow)")
+        cols = self.read_columns()
+        table = pa.table({
+            "ts": pa.array((cols["ts"] * 1000).astype("int64"), type=pa.timestamp("ms")),
+            "bank": pa.array(cols["bank"], type=pa.string()).dictionary_encode(),
+            "fp": pa.array(cols["fp"], type=pa.string()), "choice": pa.array(cols["choice"], type=pa.string()),
+            "correct": pa.array(cols["correct"]), "latency": pa.array(cols["latency"]),
+            "session": pa.array(cols["session"], type=pa.string()).dictionary_encode(),
+        })
+        sink = pa.BufferOutputStream()
+        if fmt == "parquet":
+            pa.parquet.write_table(table, sink, compression="zstd")
+        else:
+            with pa.ipc.new_file(sink, table.schema) as w:
+                w.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+@st.cache_resource(show_spinner=False)
+def get_event_log(path):
+    log = EventLog(path)
+    atexit.register(log.flush)
+    return log
+
+def log_answer_event(bk, q, choice, correct, seconds, ts):
+    sid = st.session_state.setdefault("session_id", os.urandom(8).hex())
+    fp, choice = question_fingerprint(q), normalize_answer(choice, q.get("code"))
+    try:
+        items = get_item_analysis(EVENT_LOG_DIR)  # bootstrap before appending so this event is not counted twice
+        items.add([fp], [bk], [sid], [choice], [bool(correct)])
+        # a failed flush inside append keeps the row buffered, so the analysis above already counts it
+        get_event_log(EVENT_LOG_DIR).append(ts, bk, fp, choice, bool(correct), float(seconds), sid)
+    except Exception:
+        pass  # like save_state: a full disk or bad log dir must not break answering
+
+# --- running per-bank stats (updated on every answer, never rescanned) ---
+MAX_TASK_SECONDS = 600
+
+def new_stats():
+    return {"events": 0, "correct": 0, "streak": 0, "best_streak": 0, "seconds": 0.0,
+            "by_type": {}, "daily": {}, "per_q": {}}
+
+def start_question_timer(bk, q):
+    fp = question_fingerprint(q)
+    timer = st.session_state.get("q_timer")
+    if not timer or timer[0] != bk or timer[1] != fp:
+        st.session_state.q_timer = (bk, fp, time.time())
+
+def question_elapsed(bk, q):
+    timer = st.session_state.get("q_timer")
+    if timer and timer[0] == bk and timer[1] == question_fingerprint(q):
+        return min(time.time() - timer[2], MAX_TASK_SECONDS)
+    return 0.0
+
+def record_answer(pg, bk, q, choice, correct, seconds=0.0, ts=None):
+    stats = pg.setdefault("stats", new_stats())
+    ok = int(bool(correct))
+    ts = ts or time.time()
+    log_answer_event(bk, q, choice, correct, seconds, ts)
+    stats["events"] += 1
+    stats["correct"] += ok
+    stats["seconds"] += seconds
+    stats["streak"] = stats["streak"] + 1 if ok else 0
+    stats["best_streak"] = max(stats["best_streak"], stats["streak"])
+    t = q.get("type", "未知")
+    bt = stats["by_type"].setdefault(t, [0, 0])
+    bt[0] += 1; bt[1] += ok
+    day = stats["daily"].setdefault(time.strftime("%Y-%m-%d", time.localtime(ts)), {}).setdefault(t, [0, 0, 0.0])
+    day[0] += 1; day[1] += ok; day[2] += seconds
+    pq = stats["per_q"].setdefault(question_fingerprint(q), [0, 0, 0.0])
+    pq[0] += 1; pq[1] += ok; pq[2] = ts
+
+def stats_rollup(bk, stats):
+    # cached per session on (this stats dict, event count): the heavy part only reruns after new answers,
+    # and a re-imported bank with the same name and count never reuses another bank's rollup
+    cache = st.session_state.setdefault("stats_rollup", {})
+    hit = cache.get(bk)
+    if hit is None or hit[0] is not stats or hit[1] != stats["events"]:
+        hit = cache[bk] = (stats, stats["events"], compute_stats_rollup(stats))
+    return hit[2]
+
+def compute_stats_rollup(stats):
+    rows = [(d, t, a, c, sec) for d, per_t in stats["daily"].items() for t, (a, c, sec) in per_t.items()]
+    daily = pd.DataFrame(rows, columns=["date", "type", "attempts", "correct", "seconds"])
+    if not daily.empty:
+        daily["date"] = pd.to_datetime(daily["date"])
+        acc = daily.pivot_table(index="date", columns="type", values=["attempts", "correct"], aggfunc="sum").sort_index()
+        acc = (acc["correct"].cumsum() / acc["attempts"].cumsum()).ffill()
+        minutes = daily.groupby("date")["seconds"].sum().sort_index() / 60.0
+    else:
+        acc, minutes = pd.DataFrame(), pd.Series(dtype=float)
+    per_q = stats["per_q"]
+    fps = np.array(list(per_q.keys()), dtype=object)
+    counts = np.array([v[:2] for v in per_q.values()], dtype=float).reshape(-1, 2)
+    weak = []
+    if len(fps):
+        err = 1.0 - counts[:, 1] / counts[:, 0]
+        order = np.lexsort((-counts[:, 0], -err))
+        order = order[err[order] > 0][:20]
+        weak = list(zip(fps[order].tolist(), counts[order, 0].astype(int).tolist(), err[order].tolist()))
+    return acc, minutes, weak
+
+def render_stats(bk):
+    pg = st.session_state.progress.setdefault(bk, new_progress())
+    stats = pg.get("stats") or new_stats()
+    st.markdown(f"### 📈 学习统计 · {bk}")
+    total = stats["events"]
+    c1, c2, c3, c4, c5 = st.columns(5)
+    c1.metric("总作答", total)
+    c2.metric("正确率", f"{stats['correct'] / total:.0%}" if total else "-")
+    c3.metric("当前连对", stats["streak"])
+    c4.metric("最长连对", stats["best_streak"])
+    c5.metric("学习时长", f"{stats['seconds'] / 60:.0f} 分钟")
+    if not total:
+        st.info("当前题库还没有作答记录。")
+    else:
+        st.markdown("**各题型正确率**")
+        st.dataframe(pd.DataFrame([{"题型": t, "作答": a, "正确": c, "正确率": f"{c / a:.0%}"}
+                                   for t, (a, c) in stats["by_type"].items()]), hide_index=True, use_container_width=True)
+        acc, minutes, weak = stats_rollup(bk, stats)
+        if len(acc) > 1:
+            st.markdown("**累计正确率趋势**")
+            st.line_chart(acc)
+            st.markdown("**每日学习时长（分钟）**")
+            st.bar_chart(minutes)
+        if weak:
+            by_fp = {question_fingerprint(q): q for q in st.session_state.banks.get(bk, [])}
+            st.markdown("**最薄弱的题目**")
+            st.dataframe(pd.DataFrame([{"题目": ensure_parsed(by_fp[fp]).get("content", "")[:60] if fp in by_fp else "(已删除)",
+                                        "作答": n, "错误率": f"{e:.0%}"} for fp, n, e in weak]),
+                         hide_index=True, use_container_width=True)
+    if st.button("关闭统计", use_container_width=True):
+        st.session_state.show_stats = False
+        st.rerun()
+
+# --- item analysis: cohort-wide difficulty / discrimination / distractors over the answer event log ---
+ITEM_MIN_N = 20           # attempts before a question is judged at all
+ITEM_MIN_SESSION = 5      # answers a session needs before its score counts toward discrimination
+ITEM_EASY, ITEM_HARD, ITEM_LOW_R = 0.95, 0.25, 0.15
+
+def choice_mask(choice):
+    m = 0
+    for ch in choice:
+        if "A" <= ch <= "Z": m |= 1 << (ord(ch) - 65)
+    return m
+
+def mask_letters(m):
+    return "".join(chr(65 + k) for k in range(26) if m >> k & 1)
+
+class ItemAnalysis:
+    """per-question counters fed by every logged answer; discrimination is recomputed in one vectorized pass."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows, self.banks, self.fps, self.sessions = {}, [], [], {}
+        self.attempts = np.zeros(0, dtype=np.int64)
+        self.correct = np.zeros(0, dtype=np.int64)
+        self.option_counts = np.zeros((0, 26), dtype=np.int64)
+        self.key_mask = np.zeros(0, dtype=np.int64)
+        # per-event (item, session, correct) columns, grown by doubling, for the point-biserial pass
+        self._ev = np.zeros((0, 3), dtype=np.int64)
+        self.n_events = 0
+        self._report = (-1, None)
+
+    def _grow(self, n_items):
+        have = len(self.attempts)
+        if n_items > have:
+            extra = max(n_items - have, have)
+            self.attempts = np.concatenate([self.attempts, np.zeros(extra, dtype=np.int64)])
+            self.correct = np.concatenate([self.correct, np.zeros(extra, dtype=np.int64)])
+            self.key_mask = np.concatenate([self.key_mask, np.zeros(extra, dtype=np.int64)])
+            self.option_counts = np.vstack([self.option_counts, np.zeros((extra, 26), dtype=np.int64)])
+
+    def add(self, fps, banks, sessions, choices, correct):
+        with self._lock:
+            rows = np.empty(len(fps), dtype=np.int64)
+            for i, (fp, bk) in enumerate(zip(fps, banks)):
+                r = self.rows.get(fp)
+                if r is None:
+                    r = self.rows[fp] = len(self.fps)
+                    self.fps.append(fp); self.banks.append(bk)
+                rows[i] = r
+            sess = np.fromiter((self.sessions.setdefault(s, len(self.sessions)) for s in sessions), dtype=np.int64, count=len(rows))
+            ok = np.asarray(correct, dtype=np.int64)
+            masks = np.fromiter((choice_mask(c) for c in choices), dtype=np.int64, count=len(rows))
+            self._grow(len(self.fps))
+            np.add.at(self.attempts, rows, 1)
+            np.add.at(self.correct, rows, ok)
+            present = int(np.bitwise_or.reduce(masks)) if len(masks) else 0
+            for k in range(26):
+                if present >> k & 1:
+                    hit = rows[(masks >> k) & 1 == 1]
+                    np.add.at(self.option_counts[:, k], hit, 1)
+            right = ok == 1
+            self.key_mask[rows[right]] = masks[right]
+            end = self.n_events + len(rows)
+            if end > len(self._ev):
+                self._ev = np.vstack([self._ev, np.zeros((max(end - len(self._ev), len(self._ev)), 3), dtype=np.int64)])
+            self._ev[self.n_events:end] = np.column_stack([rows, sess, ok])
+            self.n_events = end
+
+    def report(self):
+        # cached by event count, so viewing the page without new answers costs nothing
+        with self._lock:
+            if self._report[0] == self.n_events:
+                return self._report[1]
+            n_items, ev = len(self.fps), self._ev[:self.n_events].copy()
+            attempts, correct = self.attempts[:n_items].copy(), self.correct[:n_items].copy()
+            counts, keys = self.option_counts[:n_items].copy(), self.key_mask[:n_items].copy()
+            fps, banks, n_events = list(self.fps), list(self.banks), self.n_events
+        item, sess, ok = ev[:, 0], ev[:, 1], ev[:, 2].astype(float)
+        # point-biserial against the rest score: the session's accuracy on every other answer
+        s_n = np.bincount(sess).astype(float)
+        s_c = np.bincount(sess, weights=ok)
+        others = s_n[sess] - 1
+        valid = others >= ITEM_MIN_SESSION
+        rest = np.where(valid, (s_c[sess] - ok) / np.maximum(others, 1), 0.0)
+        it, x, y = item[valid], rest[valid], ok[valid]
+        n = np.bincount(it, minlength=n_items)
+        sx, sy = np.bincount(it, x, n_items), np.bincount(it, y, n_items)
+        sxx, sxy = np.bincount(it, x * x, n_items), np.bincount(it, x * y, n_items)
+        var = (n * sxx - sx * sx) * (n * sy - sy * sy)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r_pb = np.where(var > 0, (n * sxy - sx * sy) / np.sqrt(np.where(var > 0, var, 1)), np.nan)
+            p = correct / attempts
+            freq = counts / attempts[:, None]
+        key_bits = (keys[:, None] >> np.arange(26)) & 1 == 1
+        distract = np.where(key_bits, -1.0, freq)
+        top = distract.argmax(axis=1)
+        top_f = distract[np.arange(n_items), top]
+        flags = []
+        for i in range(n_items):
+            f = []
+            if attempts[i] >= ITEM_MIN_N:
+                if correct[i] == 0: f.append("无人答对（答案可能有误）")
+                elif p[i] >= ITEM_EASY: f.append("过易")
+                elif p[i] <= ITEM_HARD: f.append("过难")
+                if r_pb[i] < 0: f.append("区分度为负（答案可能有误）")
+                elif r_pb[i] < ITEM_LOW_R: f.append("区分度低")
+                if top_f[i] > p[i]: f.append(f"干扰项 {chr(65 + top[i])} 比正确答案更常被选")
+            flags.append("；".join(f))
+        df = pd.DataFrame({
+            "bank": banks, "fp": fps, "attempts": attempts, "p": p, "r_pb": r_pb,
+            "key": [mask_letters(int(m)) for m in keys],
+            "distractors": [" · ".join(f"{chr(65 + k)} {freq[i, k]:.0%}" for k in np.flatnonzero((freq[i] > 0) & ~key_bits[i]))
+                            for i in range(n_items)],
+            "flags": flags,
+        })
+        with self._lock:
+            self._report = (n_events, df)
+        return df
+
+@st.cache_resource(show_spinner=False)
+def get_item_analysis(path):
+    # bootstrapped once per process from everything already logged, then fed by log_answer_event;
+    # other processes' answers after that show up on the next restart
+    ia = ItemAnalysis()
+    cols = get_event_log(path).read_columns()
+    if len(cols["ts"]):
+        ia.add(cols["fp"].tolist(), cols["bank"].tolist(), cols["session"].tolist(), cols["choice"].tolist(), cols["correct"])
+    return ia
+
+def goto_question(bk, fp):
+    qs = st.session_state.banks.get(bk)
+    if not qs:
+        return False
+    for q in qs:
+        if question_fingerprint(q) == fp:
+            st.session_state.active_bank = bk
+            st.session_state.filters[bk] = list({q['type'] for q in qs})
+            pg = progress_for(bk, qs)
+            pg["current_id"], pg["done"] = q["id"], False
+            save_state("active_bank", "filters", "progress", bank=bk)
+            return True
     return False
 
+def render_item_analysis():
+    st.markdown("### 🔬 题目质量分析（全体用户）")
+    df = get_item_analysis(EVENT_LOG_DIR).report()
+    flagged = df[df["flags"] != ""]
+    c1, c2, c3 = st.columns(3)
+    c1.metric("作答事件", int(df["attempts"].sum()))
+    c2.metric(f"已分析题目（≥{ITEM_MIN_N} 次作答）", int((df["attempts"] >= ITEM_MIN_N).sum()))
+    c3.metric("被标记", len(flagged))
+    banks = sorted(flagged["bank"].unique().tolist())
+    pick = st.selectbox("题库", ["全部"] + banks, key="item_bank")
+    if pick != "全部":
+        flagged = flagged[flagged["bank"] == pick]
+    if flagged.empty:
+        st.info("暂无需要关注的题目。")
+    else:
+        flagged = flagged.sort_values(["r_pb", "p"], na_position="last").head(200)
+        by_fp = {}
+        for bk in flagged["bank"].unique():
+            by_fp.update({question_fingerprint(q): q for q in st.session_state.banks.get(bk) or []})
+        content = [ensure_parsed(by_fp[fp]).get("content", "")[:60] if fp in by_fp else "(题库中已不存在)" for fp in flagged["fp"]]
+        st.dataframe(pd.DataFrame({
+            "题库": flagged["bank"], "题目": content, "作答": flagged["attempts"], "正确率": flagged["p"].map("{:.0%}".format),
+            "区分度": flagged["r_pb"].round(2), "答案": flagged["key"], "干扰项选择率": flagged["distractors"], "问题": flagged["flags"],
+        }), hide_index=True, use_container_width=True)
+        rows = list(zip(flagged["bank"], flagged["fp"], content))
+        target = st.selectbox("定位到题目", range(len(rows)), format_func=lambda i: f"{rows[i][0]} · {rows[i][2]}", key="item_target")
+        if st.button("打开该题", use_container_width=True):
+            if goto_question(rows[target][0], rows[target][1]):
+                st.session_state.show_items = False
+                st.rerun()
+            st.warning("题库中找不到这道题（可能已修改或删除）。")
+    if st.button("关闭分析", use_container_width=True):
+        st.session_state.show_items = False
+        st.rerun()
+
+# --- sampling engine: stratified / weighted draws over per-type index arrays, never copying the bank ---
+def type_index(bk, qs):
+    # keyed by list identity + length so a replaced or re-synced bank is re-indexed
+    cache = st.session_state.setdefault("type_index", {})
+    sig = (id(qs), len(qs))
+    hit = cache.get(bk)
+    if hit is None or hit[0] != sig:
+        idx = {}
+        for i, q in enumerate(qs):
+            idx.setdefault(q.get("type"), []).append(i)
+        hit = cache[bk] = (sig, {t: np.array(v, dtype=np.int64) for t, v in idx.items()})
+    return hit[1]
+
+def pool_for_types(bk, qs, types):
+    parts = [ids for t, ids in type_index(bk, qs).items() if t in types]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+def allocate_strata(n, ratios, capacity):
+    # largest-remainder split of n over the types with a positive share, capped by what each can supply
+    active = [t for t in ratios if ratios[t] > 0 and capacity.get(t, 0) > 0]
+    alloc = {t: 0 for t in active}
+    left = min(n, sum(capacity[t] for t in active))
+    while left > 0:
+        open_t = [t for t in active if alloc[t] < capacity[t]]
+        total = sum(ratios[t] for t in open_t)
+        want = {t: left * ratios[t] / total for t in open_t}
+        grant = {t: min(int(want[t]), capacity[t] - alloc[t]) for t in open_t}
+        if not any(grant.values()):
+            for t in sorted(open_t, key=lambda t: want[t] - int(want[t]), reverse=True)[:left]:
+                grant[t] = 1
+        for t, g in grant.items():
+            alloc[t] += g; left -= g
+    return alloc
+
+def sample_questions(bk, qs, pg, n, ratios, weight_wrong=1.0, weight_unseen=1.0, exclude_mastered=False, rng=None):
+    rng = rng or np.random.default_rng()
+    ids_by_type = {t: ids for t, ids in type_index(bk, qs).items() if t in ratios}
+    weighted = weight_wrong != 1.0 or weight_unseen != 1.0 or exclude_mastered
+    per_q = (pg.get("stats") or {}).get("per_q", {})
+    wrong_fps = {question_fingerprint(w) for w in pg.get("wrong", [])} if weighted else set()
+    weights, capacity = {}, {}
+    for t, ids in ids_by_type.items():
+        if not weighted:
+            weights[t], capacity[t] = None, len(ids)
+            continue
+        w = np.ones(len(ids))
+        for j, i in enumerate(ids.tolist()):
+            fp = question_fingerprint(qs[i])
+            seen = per_q.get(fp)
+            if seen is None:
+                w[j] *= weight_unseen
+            elif exclude_mastered and seen[0] >= 2 and seen[1] == seen[0] and fp not in wrong_fps:
+                w[j] = 0.0
+            if fp in wrong_fps:
+                w[j] *= weight_wrong
+        weights[t], capacity[t] = w, int(np.count_nonzero(w))
+    alloc = allocate_strata(n, ratios, capacity)
+    picked = []
+    for t, k in alloc.items():
+        if k <= 0:
+            continue
+        w = weights[t]
+        p = None if w is None else w / w.sum()
+        picked.append(rng.choice(ids_by_type[t], size=k, replace=False, p=p))
+    out = np.concatenate(picked) if picked else np.empty(0, dtype=np.int64)
+    rng.shuffle(out)
+    return out
+
+# --- stable question ids: progress is keyed by q["id"], positions come from a cached per-filter view ---
+def new_progress():
+    return {"history": {}, "wrong": [], "current_id": None}
+
+def ensure_unique_ids(bk, qs):
+    # parsers number questions 0..n-1, but merged or hand-edited banks can repeat or drop ids
+    seen, fix = set(), []
+    for i, q in enumerate(qs):
+        qid = q.get("id")
+        if not isinstance(qid, int) or qid in seen: fix.append(i)
+        else: seen.add(qid)
+    if fix:
+        nxt = max(seen, default=-1) + 1
+        for i in fix:
+            qs[i]["id"] = nxt; nxt += 1
+        st.session_state.banks[bk] = qs
+        save_state("banks")
+
+class QuestionView:
+    """the filtered question list addressed by id: O(1) id -> position, no per-rerun list copies."""
+    def __init__(self, qs, ids, full_of, full_pos):
+        self.qs, self.full_of, self.full_pos = qs, full_of, full_pos
+        self.ids = ids[full_pos]
+        self.to_view = np.full(len(qs), -1, dtype=np.int64)
+        self.to_view[full_pos] = np.arange(len(full_pos))
+
+    def __len__(self):
+        return len(self.full_pos)
+
+    def __getitem__(self, pos):
+        if isinstance(pos, slice):
+            return [self.qs[i] for i in self.full_pos[pos].tolist()]
+        return self.qs[int(self.full_pos[pos])]
+
+    def pos(self, qid):
+        # a question hidden by the filter maps to the next one that is shown, so a filter switch keeps the place
+        f = self.full_of.get(qid)
+        if f is None:
+            return None
+        p = self.to_view[f]
+        return int(p) if p >= 0 else int(np.searchsorted(self.full_pos, f))
+
+    def shows(self, qid):
+        f = self.full_of.get(qid)
+        return f is not None and self.to_view[f] >= 0
+
+    def next_unanswered(self, history, start=0):
+        if not len(self):
+            return None
+        answered = np.isin(self.ids, np.fromiter(history.keys(), dtype=np.int64, count=len(history)))
+        todo = np.flatnonzero(~answered)
+        if not len(todo):
+            return None
+        k = np.searchsorted(todo, start)
+        return int(todo[k % len(todo)])  # wraps around to earlier gaps
+
+def question_view(bk, qs, filters):
+    # bank-level id map keyed by list identity + length (like type_index), one view per filter combination
+    cache = st.session_state.setdefault("qview", {})
+    sig = (id(qs), len(qs))
+    hit = cache.get(bk)
+    if hit is None or hit["sig"] != sig:
+        ensure_unique_ids(bk, qs)
+        ids = np.fromiter((q["id"] for q in qs), dtype=np.int64, count=len(qs))
+        hit = cache[bk] = {"sig": sig, "ids": ids, "full_of": dict(zip(ids.tolist(), range(len(qs)))), "views": {}}
+    key = tuple(sorted(filters))
+    view = hit["views"].get(key)
+    if view is None:
+        full_pos = np.sort(pool_for_types(bk, qs, filters))
+        view = hit["views"][key] = QuestionView(qs, hit["ids"], hit["full_of"], full_pos)
+    return view
+
+def forget_bank_views(bk):
+    # cached views hold the bank's list: drop them with the bank so the memory budget stays real
+    st.session_state.get("qview", {}).pop(bk, None)
+
+def active_view(bk):
+    qs = st.session_state.banks.get(bk, [])
+    filters = st.session_state.filters.get(bk) or list({q['type'] for q in qs})
+    return question_view(bk, qs, filters)
+
+def progress_for(bk, qs):
+    pg = st.session_state.progress.setdefault(bk, new_progress())
+    if "current_idx" in pg:
+        # saved before ids: history keys and current_idx were positions in the filtered list of the time
+        ensure_unique_ids(bk, qs)
+        filters = st.session_state.filters.get(bk) or list({q['type'] for q in qs})
+        old_view = [q for q in qs if q['type'] in filters]
+        pg["history"] = {old_view[p]["id"]: a for p, a in pg.get("history", {}).items()
+                         if isinstance(p, int) and 0 <= p < len(old_view)}
+        cur = pg.pop("current_idx")
+        pg["current_id"] = old_view[min(cur, len(old_view) - 1)]["id"] if old_view and cur > 0 else None
+        pg["done"] = bool(old_view) and cur >= len(old_view)
+        save_state("progress", bank=bk)
+    return pg
+
+def current_position(view, pg):
+    # "done" means just past current_id, so it also resolves sensibly under another filter
+    cid = pg.get("current_id")
+    p = view.pos(cid)
+    if p is None:
+        return len(view) if pg.get("done") else 0
+    return p + 1 if pg.get("done") and view.shows(cid) else p
+
+def set_position(pg, view, pos):
+    if pos >= len(view):
+        pg["done"] = True
+        if len(view): pg["current_id"] = int(view.ids[-1])
+    else:
+        pg["done"] = False
+        pg["current_id"] = int(view.ids[max(pos, 0)])
+
+# --- exam mode: one form per paper, graded in a single pass ---
+def start_exam(bk, pool, n, minutes):
+    pos = np.random.default_rng().choice(pool, size=min(n, len(pool)), replace=False)
+    qs = st.session_state.banks.get(bk, [])
+    paper = [qs[i] for i in pos.tolist()]
+    now = time.time()
+    # keys come from the picked questions themselves; ids + fingerprints find them again after a sync
+    st.session_state.exam = {
+        "bank": bk, "ids": [q["id"] for q in paper], "fps": [question_fingerprint(q) for q in paper],
+        "keys": build_answer_keys(paper).tolist(), "codes": [q.get("code") for q in paper],
+        "start": now, "deadline": now + minutes * 60, "result": None
+    }
+
+def exam_questions(exam):
+    # the paper in order; None where the bank no longer holds that exact question (deleted, re-synced, re-sampled)
+    qs = st.session_state.banks.get(exam["bank"], [])
+    full_of = active_view(exam["bank"]).full_of
+    paper = []
+    for qid, fp in zip(exam["ids"], exam["fps"]):
+        f = full_of.get(qid)
+        q = qs[f] if f is not None else None
+        paper.append(q if q is not None and question_fingerprint(q) == fp else None)
+    return paper
+
+def grade_exam(exam, responses):
+    mark_action("exam_submit")
+    bk = exam["bank"]
+    correct, resp = grade_batch(np.array(exam["keys"], dtype=object), exam["codes"], responses)
+    used = time.time() - exam["start"]
+    pg = st.session_state.progress.setdefault(bk, new_progress())
+    wrong = pg.setdefault("wrong", [])
+    seen = {w.get("raw_content") for w in wrong}
+    per_q_seconds = used / max(len(exam["ids"]), 1)
+    for q, r, ok in zip(exam_questions(exam), resp, correct):
+        if q is None:
+            continue  # question left the bank while the paper was open: scored, but nothing to record against
+        if r:
+            # blank answers still cost the score and land in 错题, but are not attempts for stats or the event log
+            record_answer(pg, bk, q, r, ok, min(per_q_seconds, MAX_TASK_SECONDS))
+        if not ok and q.get("raw_content") not in seen:
+            qc = q.copy(); qc["user_answer"] = r; wrong.append(qc); seen.add(q.get("raw_content"))
+    exam["result"] = {
+        "score": int(correct.sum()), "total": len(exam["ids"]), "used": used,
+        "overtime": used > exam["deadline"] - exam["start"] + 5,
+        "answers": resp.tolist(), "correct": correct.tolist()
+    }
+    pg.setdefault("exams", []).append({"ts": time.time(), "score": exam["result"]["score"],
+                                       "total": exam["result"]["total"], "used": used})
+    save_state("progress", bank=bk)
+
+def render_exam(exam):
+    paper = exam_questions(exam)
+    res = exam.get("result")
+    if res:
+        m, s = divmod(int(res["used"]), 60)
+        st.markdown(f"<div style='text-align:center; padding:20px; background:#071223; border-radius:10px;'><h3>📝 考试结束</h3><p class='small-meta'>得分 {res['score']}/{res['total']} · 用时 {m:02d}:{s:02d}{' · 已超时' if res['overtime'] else ''}</p></div>", unsafe_allow_html=True)
+        for n, (q, a, ok) in enumerate(zip(paper, res["answers"], res["correct"]), 1):
+            if not ok and q is not None:
+                ensure_parsed(q)
+                st.markdown(f"**{n}. [{q.get('type')}]** {q.get('content')}  \n你的答案：`{a or '未作答'}` · 正确答案：`{q.get('answer','')}`")
+        if st.button("结束考试", type="primary", use_container_width=True):
+            st.session_state.exam = None
+            st.rerun()
+        return
+    deadline_ms = int(exam["deadline"] * 1000)
+    components.html(f"""<div id="t" style="color:#00ccff;font-weight:800;font-size:20px;font-family:sans-serif;"></div>
+<script>
+const end = {deadline_ms};
+function tick() {{
+  const s = Math.max(0, Math.round((end - Date.now()) / 1000));
+  document.getElementById('t').innerText = '⏱ 剩余 ' + String(Math.floor(s / 60)).padStart(2, '0') + ':' + String(s % 60).padStart(2, '0');
+  if (s <= 0) {{
+    clearInterval(h);
+    const b = Array.from(window.parent.document.querySelectorAll('button')).find(x => x.innerText.trim() === '交卷');
+    if (b) b.click();
+  }}
+}}
+const h = setInterval(tick, 1000); tick();
+</script>""", height=40)
+    with st.form("exam_form"):
+        responses = []
+        for n, q in enumerate(paper, 1):
+            if q is None:
+                # keep the slot so responses stay aligned with exam["keys"]
+                st.markdown(f'<div class="zen-card"><span class="tag">{n}.</span><div class="question-text">该题已从题库中移除</div></div>', unsafe_allow_html=True)
+                responses.append("")
+                continue
+            rq = render_question(q)
+            st.markdown(f'<div class="zen-card"><span class="tag">{n}. {rq["type"]}</span><div class="question-text">{rq["content"]}</div></div>', unsafe_allow_html=True)
+            responses.append(render_answer_input(q, f"exam_{n}", allow_empty=True))
+        submitted = st.form_submit_button("交卷", type="primary", use_container_width=True)
+    if submitted:
+        grade_exam(exam, responses)
+        st.rerun()
+    if st.button("放弃考试", use_container_width=True):
+        st.session_state.exam = None
+        st.rerun()
+
+# --- rapid drill: keyboard-driven component that answers a whole chunk client-side ---
+RAPID_DRILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rapid_drill")
+RAPID_CHUNK = 100
+RAPID_FLUSH_EVERY = 20
+_rapid_drill = components.declare_component("rapid_drill", path=RAPID_DRILL_DIR)
+
+def start_rapid(bk):
+    pg = progress_for(bk, st.session_state.banks.get(bk, []))
+    # chunk ids only need to differ from any earlier drill in this session so the component resets
+    st.session_state.rapid = {"bank": bk, "start": current_position(active_view(bk), pg),
+                              "chunk_id": int(time.time() * 1000), "applied": 0}
+
+def apply_rapid_answers(bk, view, pg, answers, lo, hi):
+    # grading is redone server-side; the client-side verdict is only for instant feedback
+    mark_action("rapid_batch")
+    wrong = pg.setdefault("wrong", [])
+    seen = {w.get("raw_content") for w in wrong}
+    furthest = current_position(view, pg)
+    for a in answers:
+        qid = a.get("i")
+        p = view.pos(qid) if view.shows(qid) else None
+        if p is None or not lo <= p < hi:
+            continue
+        q = view[p]
+        choice = str(a.get("choice", ""))
+        key = normalize_answer(q.get("answer", ""), q.get("code"))
+        ok = bool(key) and normalize_answer(choice, q.get("code")) == key
+        pg["history"][q["id"]] = choice
+        record_answer(pg, bk, q, choice, ok, min(float(a.get("ms", 0)) / 1000.0, MAX_TASK_SECONDS))
+        if not ok and q.get("raw_content") not in seen:
+            qc = q.copy(); qc["user_answer"] = choice; wrong.append(qc); seen.add(q.get("raw_content"))
+        furthest = max(furthest, p + 1)
+    set_position(pg, view, furthest)
+    save_state("progress", bank=bk)
+
+def render_rapid(rapid):
+    bk = rapid["bank"]
+    view = active_view(bk)
+    pg = progress_for(bk, view.qs)
+    lo, hi = rapid["start"], min(rapid["start"] + RAPID_CHUNK, len(view))
+    key = f"rapid_{bk}_{rapid['chunk_id']}"
+
+    def take(value):
+        # apply whatever the component posted for this chunk beyond what was already applied
+        if not value or value.get("chunk_id") != rapid["chunk_id"]:
+            return False
+        answers = value.get("answers") or []
+        if len(answers) > rapid["applied"]:
+            apply_rapid_answers(bk, view, pg, answers[rapid["applied"]:], lo, hi)
+            rapid["applied"] = len(answers)
+        return True
+
+    if st.button("退出极速刷题", use_container_width=True):
+        # the component posts pending answers when it loses focus, so its last value is current by now
+        take(st.session_state.get(key))
+        st.session_state.rapid = None
+        st.rerun()
+    if lo >= hi:
+        st.markdown(f"<div style='text-align:center; padding:20px; background:#071223; border-radius:10px;'><h3>🎉 练习完成</h3><p class='small-meta'>共 {len(view)} 题，错题 {len(pg.get('wrong', []))} 道</p></div>", unsafe_allow_html=True)
+        return
+    payload = []
+    for p in range(lo, hi):
+        q = ensure_parsed(view[p])
+        if q.get("code") == "AO" or q.get("options"):
+            payload.append({"i": q["id"], "code": q.get("code"), "type": q.get("type"), "content": q.get("content"),
+                            "options": list((q.get("options") or {}).items()),
+                            "key": normalize_answer(q.get("answer", ""), q.get("code"))})
+    if not payload:
+        # free-text only chunk: nothing to drill with the keyboard
+        rapid.update(start=hi, chunk_id=rapid["chunk_id"] + 1, applied=0)
+        st.rerun()
+    value = _rapid_drill(questions=payload, chunk_id=rapid["chunk_id"], flush_every=RAPID_FLUSH_EVERY,
+                         key=key, default=None)
+    if take(value):
+        if value.get("exit"):
+            # Esc inside the drill: answers were posted with the exit request, nothing is left behind
+            st.session_state.rapid = None
+            st.rerun()
+        if value.get("done"):
+            rapid.update(start=hi, chunk_id=rapid["chunk_id"] + 1, applied=0)
+            st.rerun()
+
 # --- init session_state ---
 if 'init' not in st.session_state:
-    st.session_state.banks = {}
+    st.session_state.banks = BankManager(get_state_backend(STATE_BACKEND_URL), on_drop=forget_bank_views)
     st.session_state.progress = {}
     st.session_state.active_bank = None
     st.session_state.filters = {}
     st.session_state.favorites = []
     st.session_state.show_fav = False
+    st.session_state.show_stats = False
+    st.session_state.show_items = False
+    st.session_state.exam = None
+    st.session_state.rapid = None
     load_state()
     st.session_state.init = True
 
@@ -238,12 +1859,17 @@ if 'init' not in st.session_state:
 params = st.experimental_get_query_params()
 if params.get("advance") and st.session_state.get("pending_advance") is not None and st.session_state.active_bank:
     # perform advance once
+    mark_action("advance")
     bk_adv = st.session_state.active_bank
-    pg = st.session_state.progress.setdefault(bk_adv, {"history": {}, "wrong": [], "current_idx": 0})
-    pg["current_idx"] = st.session_state.pending_advance
+    view = active_view(bk_adv)
+    pg = progress_for(bk_adv, view.qs)
+    # pending_advance is the id just answered: move to whatever follows it under the current filter
+    p = view.pos(st.session_state.pending_advance)
+    if p is not None:
+        set_position(pg, view, p + 1 if view.shows(st.session_state.pending_advance) else p)
     # clean-up
     st.session_state.pending_advance = None
-    save_state()
+    save_state("progress", bank=bk_adv)
     # clear params and rerun to show next question
     st.experimental_set_query_params()
     st.experimental_rerun()
@@ -258,10 +1884,11 @@ with st.sidebar:
         curr_idx = bank_names.index(st.session_state.active_bank) if st.session_state.active_bank in bank_names else 0
         selected = st.selectbox("切换题库", bank_names, index=curr_idx)
         if selected != st.session_state.active_bank:
+            mark_action("switch_bank")
             st.session_state.active_bank = selected
-            st.session_state.progress.setdefault(selected, {"history": {}, "wrong": [], "current_idx": 0})
+            st.session_state.progress.setdefault(selected, new_progress())
             st.session_state.filters.setdefault(selected, list({q['type'] for q in st.session_state.banks.get(selected, [])}))
-            save_state()
+            save_state("active_bank", "progress", "filters", bank=selected)
             st.rerun()
 
         curr_q_list = st.session_state.banks.get(st.session_state.active_bank, [])
@@ -271,31 +1898,106 @@ with st.sidebar:
         st.subheader("🎯 题型筛选")
         selected_types = st.multiselect("只刷这些题型：", all_types, default=default_sel)
         if selected_types != default_sel:
+            mark_action("filter")
+            # progress is keyed by id, so the current question and answers carry over to the new filter
             st.session_state.filters[st.session_state.active_bank] = selected_types
-            st.session_state.progress.setdefault(st.session_state.active_bank, {"history": {}, "wrong": [], "current_idx": 0})
-            st.session_state.progress[st.session_state.active_bank]["current_idx"] = 0
-            save_state()
+            save_state("filters", bank=st.session_state.active_bank)
             st.rerun()
 
         st.markdown("---")
-        if st.button("🔀 随机抽取 100 题（基于筛选）", use_container_width=True):
-            filtered = [q for q in curr_q_list if q['type'] in selected_types]
-            if not filtered:
-                st.warning("当前筛选下没有题目，无法抽题。")
+        with st.expander("🔀 智能抽题（基于筛选）"):
+            sample_size = st.number_input("抽题数量", min_value=1, max_value=5000, value=100, step=10, key="sample_n")
+            type_sizes = {t: len(ids) for t, ids in type_index(st.session_state.active_bank, curr_q_list).items() if t in selected_types}
+            total_sel = sum(type_sizes.values()) or 1
+            ratios = {}
+            for t, cnt in type_sizes.items():
+                ratios[t] = st.number_input(f"{t} 占比 %（共 {cnt} 题）", min_value=0, max_value=100,
+                                            value=int(round(100 * cnt / total_sel)), key=f"sample_ratio_{t}")
+            w_wrong = st.slider("错题权重", 1.0, 5.0, 3.0, 0.5, key="sample_w_wrong")
+            w_unseen = st.slider("未做题权重", 1.0, 5.0, 2.0, 0.5, key="sample_w_unseen")
+            skip_mastered = st.checkbox("排除已掌握（作答 ≥2 次且全对）", value=True, key="sample_skip_mastered")
+            do_sample = st.button("🔀 抽取", use_container_width=True)
+        if do_sample:
+            mark_action("sample")
+            pg_cur = st.session_state.progress.setdefault(st.session_state.active_bank, new_progress())
+            picked = sample_questions(st.session_state.active_bank, curr_q_list, pg_cur, int(sample_size), ratios,
+                                      w_wrong, w_unseen, skip_mastered) if type_sizes else []
+            if not len(picked):
+                st.warning("当前筛选下没有可抽的题目。")
             else:
-                sample_n = min(100, len(filtered))
-                sampled = random.sample(filtered, sample_n)
+                sample_n = len(picked)
+                sampled = [curr_q_list[i] for i in picked.tolist()]
                 tmp_name = f"{st.session_state.active_bank}_随机{sample_n}"
                 st.session_state.banks[tmp_name] = [{**q, "user_answer": None} for q in sampled]
-                st.session_state.progress[tmp_name] = {"history": {}, "wrong": [], "current_idx": 0}
+                st.session_state.progress[tmp_name] = new_progress()
                 st.session_state.filters[tmp_name] = list({q['type'] for q in sampled})
                 st.session_state.active_bank = tmp_name
-                save_state()
+                save_state("banks", "progress", "filters", "active_bank")
                 st.success(f"已创建题库：{tmp_name}，共 {sample_n} 题，已开始练习。")
                 st.rerun()
+
+        st.markdown("---")
+        st.subheader("📝 模拟考试")
+        exam_n = st.number_input("题量", min_value=1, max_value=1000, value=50, step=10, key="exam_n")
+        exam_min = st.number_input("时长（分钟）", min_value=1, max_value=600, value=30, key="exam_min")
+        if st.button("开始考试（基于筛选）", use_container_width=True):
+            mark_action("exam_start")
+            pool = pool_for_types(st.session_state.active_bank, curr_q_list, selected_types)
+            if not len(pool):
+                st.warning("当前筛选下没有题目，无法组卷。")
+            else:
+                start_exam(st.session_state.active_bank, pool, int(exam_n), int(exam_min))
+                st.rerun()
+
+        st.markdown("---")
+        if st.button("⚡ 极速刷题（键盘作答）", use_container_width=True):
+            mark_action("rapid_start")
+            start_rapid(st.session_state.active_bank)
+            st.rerun()
+        if st.button("📈 学习统计", use_container_width=True):
+            mark_action("stats")
+            st.session_state.show_stats = True
+        if st.button("🔬 题目质量分析", use_container_width=True):
+            mark_action("item_analysis")
+            st.session_state.show_items = True
     else:
         st.info("暂无题库，先导入一个 Excel 或 Word 文档。")
 
+    if bank_names:
+        with st.expander("📦 题库内存"):
+            bm = st.session_state.banks.metrics()
+            lookups = bm["hits"] + bm["misses"]
+            st.caption(f"常驻 {bm['resident']}/{bm['banks']} 个题库 · 约 {bm['resident_bytes'] / 2**20:.1f}/{bm['budget'] / 2**20:.1f} MB")
+            st.caption(f"命中 {bm['hits']} · 未命中 {bm['misses']} · 换出 {bm['evictions']}"
+                       + (f" · 命中率 {bm['hits'] / lookups:.0%}" if lookups else ""))
+
+    with st.expander("📝 答题日志"):
+        event_log = get_event_log(EVENT_LOG_DIR)
+        st.caption(f"本进程已记录 {event_log.appended} 条 · 共 {len(event_log.segments())} 个分段")
+        if ARROW_AVAILABLE:
+            fmt = st.radio("导出格式", ["Parquet", "Arrow IPC"], horizontal=True, key="event_export_fmt")
+            if st.button("生成导出文件", use_container_width=True):
+                mark_action("event_export")
+                ext = "parquet" if fmt == "Parquet" else "arrow"
+                st.session_state.event_export = (ext, event_log.export(ext))
+            export = st.session_state.get("event_export")
+            if export:
+                st.download_button(f"下载 {export[0]} ({len(export[1]) / 2**10:.0f} KB)", export[1],
+                                   f"zen_events_{time.strftime('%Y%m%d_%H%M%S')}.{export[0]}", use_container_width=True)
+        else:
+            st.caption("安装 pyarrow 后可导出 Parquet / Arrow IPC")
+
+    if st.session_state.get("profiles"):
+        with st.expander("🧪 性能剖析"):
+            for n, prof in enumerate(reversed(st.session_state.profiles)):
+                stamp = time.strftime("%H:%M:%S", time.localtime(prof["ts"]))
+                st.download_button(f"{stamp} · {prof['label']} · {prof['seconds'] * 1000:.0f} ms", prof["data"],
+                                   f"zen_{time.strftime('%Y%m%d_%H%M%S', time.localtime(prof['ts']))}_{prof['label']}.{prof['ext']}",
+                                   key=f"profile_dl_{prof['ts']}", use_container_width=True)
+            if st.button("清空剖析记录", use_container_width=True):
+                st.session_state.profiles.clear()
+                st.rerun()
+
     # Favorites
     st.markdown("---")
     st.subheader("⭐ 收藏题目")
@@ -305,6 +2007,7 @@ with st.sidebar:
         if st.button("查看收藏列表", use_container_width=True):
             st.session_state.show_fav = True
         if st.button("导出收藏 (可再次导入)", use_container_width=True):
+            mark_action("export")
             rows = []
             for q in st.session_state.favorites:
                 rows.append({
@@ -324,16 +2027,16 @@ with st.sidebar:
                 new_name += f"_{int(random.random()*10000)}"
             new_qs = [{**q, "user_answer": None} for q in st.session_state.favorites]
             st.session_state.banks[new_name] = new_qs
-            st.session_state.progress[new_name] = {"history": {}, "wrong": [], "current_idx": 0}
+            st.session_state.progress[new_name] = new_progress()
             st.session_state.filters[new_name] = list({q['type'] for q in new_qs})
             st.session_state.active_bank = new_name
-            save_state()
+            save_state("banks", "progress", "filters", "active_bank")
             st.success(f"已创建题库：{new_name}，并切换到该题库。")
             st.rerun()
 
     if fav_count > 0 and st.button("清空收藏", use_container_width=True):
         st.session_state.favorites = []
-        save_state()
+        save_state("favorites")
         st.success("已清空收藏。")
         st.rerun()
 
@@ -343,43 +2046,61 @@ with st.sidebar:
     uploaded_excel = st.file_uploader("上传 Excel (.xlsx/.xls)", type=["xlsx", "xls"])
     uploaded_docx = st.file_uploader("上传 Word (.docx)", type=["docx"])
     name_input = st.text_input("题库命名（可选）", key="import_name")
+    sync_mode = st.checkbox("同名题库增量同步（保留进度）", key="import_sync")
+    if st.session_state.get("sync_report"):
+        st.success(st.session_state.pop("sync_report"))
     if uploaded_excel and st.button("导入 Excel", use_container_width=True):
+        mark_action("import")
         file_bytes = uploaded_excel.getvalue()
         try:
             with st.spinner("解析 Excel..."):
-                qs = parse_excel_bytes(file_bytes)
+                qs = parse_file_cached("excel", file_bytes)
         except Exception as e:
             st.error(f"导入失败：{e}")
         else:
             final_name = name_input.strip() if name_input.strip() else uploaded_excel.name.split(".")[0]
+            if sync_mode and final_name in st.session_state.banks:
+                r = sync_bank(final_name, qs)
+                st.session_state.active_bank = final_name
+                save_state("active_bank")
+                st.session_state.sync_report = f"已同步题库：{final_name}（新增 {r['added']}，修改 {r['updated']}，删除 {r['deleted']}，未变 {r['unchanged']}）"
+                st.rerun()
             if final_name in st.session_state.banks:
                 final_name += f"_{int(random.random()*100000)}"
             st.session_state.banks[final_name] = qs
-            st.session_state.progress[final_name] = {"history": {}, "wrong": [], "current_idx": 0}
+            st.session_state.progress[final_name] = new_progress()
             st.session_state.filters[final_name] = list({q['type'] for q in qs})
             st.session_state.active_bank = final_name
-            save_state()
+            save_state("banks", "progress", "filters", "active_bank")
+            warm_options_async(qs)
             st.success(f"已导入题库：{final_name} （共 {len(qs)} 题）")
             st.rerun()
 
     if uploaded_docx and st.button("导入 Word (.docx)", use_container_width=True):
+        mark_action("import")
         file_bytes = uploaded_docx.getvalue()
         try:
             with st.spinner("解析 Word 文档..."):
-                qs = parse_docx_bytes(file_bytes)
+                qs = parse_file_cached("docx", file_bytes)
         except Exception as e:
             st.error(f"导入失败：{e}")
             if not DOCX_AVAILABLE:
                 st.info("提示：请在运行环境安装 python-docx：pip install python-docx")
         else:
             final_name = name_input.strip() if name_input.strip() else uploaded_docx.name.split(".")[0]
+            if sync_mode and final_name in st.session_state.banks:
+                r = sync_bank(final_name, qs)
+                st.session_state.active_bank = final_name
+                save_state("active_bank")
+                st.session_state.sync_report = f"已同步题库：{final_name}（新增 {r['added']}，修改 {r['updated']}，删除 {r['deleted']}，未变 {r['unchanged']}）"
+                st.rerun()
             if final_name in st.session_state.banks:
                 final_name += f"_{int(random.random()*100000)}"
             st.session_state.banks[final_name] = qs
-            st.session_state.progress[final_name] = {"history": {}, "wrong": [], "current_idx": 0}
+            st.session_state.progress[final_name] = new_progress()
             st.session_state.filters[final_name] = list({q['type'] for q in qs})
             st.session_state.active_bank = final_name
-            save_state()
+            save_state("banks", "progress", "filters", "active_bank")
             st.success(f"已导入 Word 题库：{final_name} （共 {len(qs)} 题）")
             st.rerun()
 
@@ -388,12 +2109,13 @@ with st.sidebar:
         st.markdown("---")
         with st.expander("⚠️ 删除当前题库"):
             if st.button("确认删除当前题库", use_container_width=True):
+                mark_action("delete_bank")
                 name_del = st.session_state.active_bank
                 if name_del in st.session_state.banks: del st.session_state.banks[name_del]
                 if name_del in st.session_state.progress: del st.session_state.progress[name_del]
                 if name_del in st.session_state.filters: del st.session_state.filters[name_del]
                 st.session_state.active_bank = list(st.session_state.banks.keys())[0] if st.session_state.banks else None
-                save_state()
+                save_state("banks", "progress", "filters", "active_bank")
                 st.success("已删除题库。")
                 st.rerun()
 
@@ -401,11 +2123,12 @@ with st.sidebar:
 if st.session_state.get("show_fav", False):
     st.markdown("### ⭐ 收藏题目列表")
     for i, q in enumerate(list(st.session_state.favorites)):
+        ensure_parsed(q)
         st.markdown(f"**{i+1}. [{q.get('type')}]** {q.get('content')}")
         cols = st.columns([1,1,1])
         if cols[0].button("取消收藏", key=f"unfav_{i}"):
             st.session_state.favorites = [f for f in st.session_state.favorites if f.get("raw_content") != q.get("raw_content")]
-            save_state()
+            save_state("favorites")
             st.experimental_rerun()
         if cols[1].button("导出此题", key=f"export_fav_{i}"):
             df = pd.DataFrame([{ "题目类型": q.get("type",""), "题目内容": q.get("raw_content", q.get("content","")), "正确答案": q.get("answer",""), "你的误选": q.get("user_answer","") }])
@@ -416,10 +2139,10 @@ if st.session_state.get("show_fav", False):
         if cols[2].button("存为题库", key=f"fav2bank_{i}"):
             new_name = f"fav_{int(random.random()*100000)}"
             st.session_state.banks[new_name] = [{**qq, "user_answer": None} for qq in st.session_state.favorites]
-            st.session_state.progress[new_name] = {"history": {}, "wrong": [], "current_idx": 0}
+            st.session_state.progress[new_name] = new_progress()
             st.session_state.filters[new_name] = list({qq['type'] for qq in st.session_state.banks[new_name]})
             st.session_state.active_bank = new_name
-            save_state()
+            save_state("banks", "progress", "filters", "active_bank")
             st.success(f"已创建题库：{new_name}")
             st.experimental_rerun()
     if st.button("关闭收藏列表"):
@@ -427,7 +2150,15 @@ if st.session_state.get("show_fav", False):
         st.experimental_rerun()
 
 # --- Main quiz area ---
-if not st.session_state.active_bank:
+if st.session_state.get("exam"):
+    render_exam(st.session_state.exam)
+elif st.session_state.get("rapid"):
+    render_rapid(st.session_state.rapid)
+elif st.session_state.get("show_items"):
+    render_item_analysis()
+elif st.session_state.get("show_stats") and st.session_state.active_bank:
+    render_stats(st.session_state.active_bank)
+elif not st.session_state.active_bank:
     st.markdown("<div style='text-align:center; padding:60px 0;'><h1>👋 ZenMode Ultimate</h1><p class='small-meta'>请在侧边栏导入或选择题库</p></div>", unsafe_allow_html=True)
 else:
     bk = st.session_state.active_bank
@@ -437,12 +2168,9 @@ else:
         active_filters = list({q['type'] for q in full_qs})
         st.session_state.filters[bk] = active_filters
 
-    qs = [q for q in full_qs if q['type'] in active_filters]
-    pg = st.session_state.progress.setdefault(bk, {"history": {}, "wrong": [], "current_idx": 0})
-    idx = pg.get("current_idx", 0)
-    if idx > len(qs):
-        idx = len(qs)
-        pg["current_idx"] = idx
+    qs = question_view(bk, full_qs, active_filters)
+    pg = progress_for(bk, full_qs)
+    idx = current_position(qs, pg)
 
     total_q = len(qs)
     done_q = min(idx + 1, total_q)
@@ -451,8 +2179,8 @@ else:
     st.markdown(f"""
     <div class="hud-container">
         <div>
-            <div class="hud-item">题库: <span class="hud-value">{bk}</span></div>
-            <div class="small-meta">筛选：{', '.join(active_filters)}</div>
+            <div class="hud-item">题库: <span class="hud-value">{html.escape(bk)}</span></div>
+            <div class="small-meta">筛选：{html.escape(', '.join(active_filters))}</div>
         </div>
         <div style="text-align:right;">
             <div class="hud-item">进度 <span class="hud-value hud-accent">{done_q}</span>/<span class="small-meta">{total_q}</span></div>
@@ -466,86 +2194,85 @@ else:
     elif idx >= total_q:
         st.markdown(f"<div style='text-align:center; padding:20px; background:#071223; border-radius:10px;'><h3>🎉 练习完成</h3><p class='small-meta'>共 {total_q} 题，错题 {wrong_q} 道</p></div>", unsafe_allow_html=True)
         if st.button("🔁 再刷一次", use_container_width=True, type="primary"):
-            pg["current_idx"] = 0
-            pg["history"] = {}
-            save_state()
+            pg["history"], pg["current_id"], pg["done"] = {}, None, False
+            save_state("progress", bank=bk)
             st.rerun()
     else:
         q = qs[idx]
-        st.markdown(f"""<div class="zen-card"><span class="tag">{q.get('type')}</span><div class="question-text">{q.get('content')}</div></div>""", unsafe_allow_html=True)
+        qid = q["id"]
+        start_question_timer(bk, q)
+        st.markdown(render_question(q)["card"], unsafe_allow_html=True)
 
         # favorite controls (compact, unique keys)
         fav_c1, fav_c2 = st.columns([1,3])
-        if fav_c1.button("⭐ 收藏", key=f"fav_add_{bk}_{idx}", use_container_width=True):
+        if fav_c1.button("⭐ 收藏", key=f"fav_add_{bk}_{qid}", use_container_width=True):
+            mark_action("favorite")
             if not any(fav.get("raw_content") == q.get("raw_content") for fav in st.session_state.favorites):
                 ff = q.copy(); ff["user_answer"] = ff.get("user_answer", None)
-                st.session_state.favorites.append(ff); save_state(); st.success("已加入收藏"); st.experimental_rerun()
+                st.session_state.favorites.append(ff); save_state("favorites"); st.success("已加入收藏"); st.experimental_rerun()
             else:
                 st.info("此题已收藏")
-        if fav_c2.button("🔖 取消收藏", key=f"fav_rem_{bk}_{idx}", use_container_width=True):
+        if fav_c2.button("🔖 取消收藏", key=f"fav_rem_{bk}_{qid}", use_container_width=True):
+            mark_action("unfavorite")
             before = len(st.session_state.favorites)
             st.session_state.favorites = [f for f in st.session_state.favorites if f.get("raw_content") != q.get("raw_content")]
             if len(st.session_state.favorites) < before:
-                save_state(); st.success("已取消收藏")
+                save_state("favorites"); st.success("已取消收藏")
             else:
                 st.info("该题尚未收藏")
 
         # answer input
-        user_choice = None
-        saved = pg["history"].get(idx)
-        if q.get("code") == "AO":
-            sel_idx = 0 if saved == "A" else (1 if saved == "B" else 0)
-            val = st.radio("判断:", ["A", "B"], index=sel_idx, format_func=lambda x: "✅ 正确" if x=='A' else "❌ 错误", horizontal=True, key=f"ans_{bk}_{idx}")
-            user_choice = val
-        elif q.get("code") == "BO":
-            if q.get("options"):
-                keys = list(q["options"].keys()); disp = [f"{k}. {v}" for k,v in q["options"].items()]
-                sel_idx = keys.index(saved) if saved in keys else 0
-                val = st.radio("选择:", disp, index=sel_idx, key=f"ans_{bk}_{idx}")
-                user_choice = val.split(".")[0] if val else None
-            else:
-                user_choice = st.text_input("答案：", value=saved or "", key=f"ans_{bk}_{idx}_text").strip().upper()
-        elif q.get("code") == "CO":
-            st.write("多项选择：")
-            if q.get("options"):
-                sel_list = []
-                for k,v in q["options"].items():
-                    checked = (k in saved) if saved else False
-                    if st.checkbox(f"{k}. {v}", value=checked, key=f"ans_{bk}_{idx}_{k}"):
-                        sel_list.append(k)
-                user_choice = "".join(sorted(sel_list)) if sel_list else ""
-            else:
-                user_choice = st.text_input("答案：", value=saved or "", key=f"ans_{bk}_{idx}_text").strip().upper()
-        else:
-            user_choice = st.text_input("答案（自由）：", value=saved or "", key=f"ans_{bk}_{idx}_text").strip()
+        saved = pg["history"].get(qid)
+        user_choice = render_answer_input(q, f"ans_{bk}_{qid}", saved)
 
         # controls and feedback placeholder
         feedback = st.empty()
         c1, c2, c3 = st.columns([1,2,1])
-        if c1.button("⬅ 上一题", disabled=(idx==0), key=f"prev_{bk}_{idx}", use_container_width=True):
-            pg["current_idx"] = max(0, idx-1); save_state(); st.rerun()
+        if c1.button("⬅ 上一题", disabled=(idx==0), key=f"prev_{bk}_{qid}", use_container_width=True):
+            mark_action("prev")
+            set_position(pg, qs, idx - 1); save_state("progress", bank=bk); st.rerun()
 
-        if c2.button("提交", type="primary", key=f"submit_{bk}_{idx}", use_container_width=True):
+        if c2.button("提交", type="primary", key=f"submit_{bk}_{qid}", use_container_width=True):
+            mark_action("submit")
             if user_choice is None or (isinstance(user_choice, str) and user_choice.strip() == ""):
                 st.warning("请先作答")
             else:
                 # record answer
-                pg["history"][idx] = user_choice
-                ans = q.get("answer", "")
-                if q.get("code") == "AO":
-                    if ans == "对": ans = "A"
-                    if ans == "错": ans = "B"
-                is_correct = (user_choice == ans)
+                pg["history"][qid] = user_choice
+                ans = normalize_answer(q.get("answer", ""), q.get("code"))
+                is_correct = bool(ans) and normalize_answer(user_choice, q.get("code")) == ans
+                record_answer(pg, bk, q, user_choice, is_correct, question_elapsed(bk, q))
                 if is_correct:
                     feedback.markdown(f"""<div class="feedback-box feedback-success">✅ 回答正确！</div>""", unsafe_allow_html=True)
                 else:
-                    feedback.markdown(f"""<div class="feedback-box feedback-error">❌ 回答错误。正确答案：<strong>{q.get('answer','')}</strong></div>""", unsafe_allow_html=True)
+                    feedback.markdown(f"""<div class="feedback-box feedback-error">❌ 回答错误。正确答案：<strong>{html.escape(str(q.get('answer','')))}</strong></div>""", unsafe_allow_html=True)
                     if not any(w.get("raw_content") == q.get("raw_content") for w in pg.get("wrong", [])):
                         qc = q.copy(); qc["user_answer"] = user_choice; pg.setdefault("wrong", []).append(qc)
-                save_state()
+                save_state("progress", bank=bk)
                 # set pending advance and trigger client reload with param after short delay (JS)
-                st.session_state.pending_advance = idx + 1
+                st.session_state.pending_advance = qid
                 components.html(f"<script>setTimeout(()=>{{let u=location.pathname + '?advance=1'; location.href=u;}},900);</script>", height=0)
 
-        if c3.button("跳过 ➡", key=f"skip_{bk}_{idx}", use_container_width=True):
-            pg["current_idx"] = idx + 1; save_state(); st.rerun()
+        if c3.button("跳过 ➡", key=f"skip_{bk}_{qid}", use_container_width=True):
+            mark_action("skip")
+            set_position(pg, qs, idx + 1); save_state("progress", bank=bk); st.rerun()
+
+        with st.expander("🧭 跳转"):
+            j1, j2, j3 = st.columns([2, 1, 1])
+            target = j1.number_input("题号", min_value=1, max_value=total_q, value=idx + 1, step=1,
+                                     key=f"jump_n_{bk}", label_visibility="collapsed")
+            if j2.button("跳到第 N 题", key=f"jump_{bk}", use_container_width=True):
+                mark_action("jump")
+                set_position(pg, qs, int(target) - 1); save_state("progress", bank=bk); st.rerun()
+            if j3.button("下一道未做", key=f"next_todo_{bk}", use_container_width=True):
+                mark_action("next_unanswered")
+                nxt = qs.next_unanswered(pg["history"], idx + 1)
+                if nxt is None:
+                    st.info("当前筛选下的题目都已作答。")
+                else:
+                    set_position(pg, qs, nxt); save_state("progress", bank=bk); st.rerun()
+
+        # warm the next few cards so navigation only re-sends cached HTML
+        prefetch_render(qs, idx + 1)
+
+finish_run_profile()
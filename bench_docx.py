@@ -0,0 +1,100 @@
+# bench_docx.py
+# Throughput benchmark: streaming OOXML reader vs the python-docx object model for .docx import.
+# usage: python bench_docx.py [--sizes 1000 10000] [--repeat 3] [--layout paragraphs|table|mixed]
+
+import argparse
+import io
+import logging
+import time
+import tracemalloc
+import zipfile
+from xml.sax.saxutils import escape
+
+from app_loader import load_app_helpers
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+DOC_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+DOC_TAIL = "</w:body></w:document>"
+
+
+def para(text):
+    return f'<w:p><w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r></w:p>'
+
+
+def question(i):
+    kind = i % 3
+    if kind == 0:
+        return [f"{i + 1}. 单选题：第 {i + 1} 题的题干", "A. 选项一", "B. 选项二", "C. 选项三", "D. 选项四", "答案：B"]
+    if kind == 1:
+        return [f"{i + 1}. 多选题：第 {i + 1} 题的题干", "A. 选项一", "B. 选项二", "C. 选项三", "D. 选项四", "答案：AC"]
+    return [f"{i + 1}. 判断题：第 {i + 1} 题的说法正确", "答案：对"]
+
+
+def make_docx(n, layout):
+    parts = [DOC_HEAD]
+    for i in range(n):
+        lines = question(i)
+        if layout == "table" or (layout == "mixed" and i % 2):
+            cells = "".join(f"<w:tc>{para(t)}</w:tc>" for t in (lines[0], "\n".join(lines[1:-1]) or " ", lines[-1]))
+            parts.append(f"<w:tbl><w:tr>{cells}</w:tr></w:tbl>")
+        else:
+            parts.extend(para(t) for t in lines)
+    parts.append(DOC_TAIL)
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", CONTENT_TYPES)
+        zf.writestr("_rels/.rels", RELS)
+        zf.writestr("word/document.xml", "".join(parts))
+    return out.getvalue()
+
+
+def measure(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description="streaming OOXML reader vs python-docx throughput")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--layout", choices=["paragraphs", "table", "mixed"], default="mixed")
+    args = ap.parse_args()
+
+    logging.disable(logging.WARNING)
+    app = load_app_helpers()
+    paths = {"stream": lambda b: list(app.split_question_blocks(app.iter_docx_texts(b)))}
+    if app.DOCX_AVAILABLE:
+        paths["python-docx"] = lambda b: list(app.split_question_blocks(app.iter_docx_texts_pydocx(b)))
+    else:
+        print("python-docx 未安装，只测试流式读取")
+
+    # peak is the Python heap seen by tracemalloc; lxml's C allocations inside python-docx are not included
+    print(f"{'questions':>10} {'path':>12} {'blocks':>8} {'best s':>9} {'q/s':>10} {'MB/s':>8} {'peak MB':>8}")
+    for n in args.sizes:
+        data = make_docx(n, args.layout)
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            xml_mb = zf.getinfo("word/document.xml").file_size / 2**20
+        for name, fn in paths.items():
+            best, peak, blocks = measure(lambda: fn(data), args.repeat)
+            print(f"{n:>10} {name:>12} {len(blocks):>8} {best:>9.3f} {n / best:>10.0f} {xml_mb / best:>8.1f} {peak / 2**20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
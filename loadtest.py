@@ -0,0 +1,277 @@
+# loadtest.py
+# Concurrent-session load test for app_v20.py: drives N simulated trainees through Streamlit's AppTest
+# against one shared state backend and reports throughput, latency percentiles, memory growth and
+# state-store damage.
+# usage: python loadtest.py --sessions 8 --questions 200 [--threads] [--backend sqlite:///tmp/zen.db]
+
+import argparse
+import concurrent.futures
+import contextlib
+import io
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from app_loader import APP_FILE, load_app_helpers
+
+# AppTest swaps a process-global mock Runtime in and out around every script run, so sessions sharing a
+# process must take turns; thread mode interleaves interactions, process mode runs them in parallel
+RUN_LOCK = contextlib.nullcontext()
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RssWatch:
+    """RSS of this process on entry and exit, plus the peak seen by a 0.2 s poller in between."""
+
+    def __enter__(self):
+        self.start = self.peak = rss_bytes()
+        self._stop = threading.Event()
+        threading.Thread(target=self._poll, daemon=True).start()
+        return self
+
+    def _poll(self):
+        while not self._stop.wait(0.2):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self.end = rss_bytes()
+        self.peak = max(self.peak, self.end)
+
+    def as_dict(self):
+        return {"start": self.start, "end": self.end, "peak": self.peak}
+
+
+def make_bank_xlsx(n, seed=0):
+    rnd = random.Random(seed)
+    kinds = [("单选", "A"), ("多选", "AC"), ("判断", "对")]
+    rows = []
+    for i in range(n):
+        kind, ans = kinds[rnd.randrange(3)]
+        opts = "" if kind == "判断" else " A. 选项一 B. 选项二 C. 选项三 D. 选项四"
+        rows.append({"题型": kind, "题目内容": f"第 {i + 1} 题（{kind}）的题干{opts}", "答案": ans})
+    out = io.BytesIO()
+    pd.DataFrame(rows).to_excel(out, index=False)
+    return out.getvalue()
+
+
+class Session:
+    """One simulated trainee: import, filter, answer, favorite, export."""
+
+    def __init__(self, sid, args, xlsx, helpers):
+        from streamlit.testing.v1 import AppTest
+        self.sid, self.args, self.xlsx, self.helpers = sid, args, xlsx, helpers
+        self.at = AppTest.from_file(APP_FILE, default_timeout=args.timeout)
+        self.latency = defaultdict(list)
+        self.errors = []
+        self.bank = None
+
+    def timed(self, kind, fn):
+        with RUN_LOCK:
+            t0 = time.perf_counter()
+            fn()
+            self.latency[kind].append(time.perf_counter() - t0)
+        if self.at.exception:
+            self.errors.append(f"{kind}: {self.at.exception[0].value}")
+
+    def click(self, label=None, key_prefix=None):
+        for b in self.at.button:
+            if (label and b.label == label) or (key_prefix and b.key and b.key.startswith(key_prefix)):
+                b.click()
+                self.at.run()
+                return True
+        return False
+
+    def do_import(self):
+        # AppTest cannot drive st.file_uploader, so the bank is parsed with the app's own cached parser,
+        # placed in session state and persisted through the sampling action, which writes a new bank
+        # exactly like the import buttons do
+        at = self.at
+        qs = self.helpers.parse_file_cached("excel", self.xlsx)
+        name = f"lt{self.sid}"
+        at.session_state.banks[name] = qs
+        at.session_state.progress[name] = self.helpers.new_progress()
+        at.session_state.filters[name] = list({q["type"] for q in qs})
+        at.session_state.active_bank = name
+        at.run()
+        at.number_input(key="sample_n").set_value(self.args.questions)
+        self.click(label="🔀 抽取")
+        self.bank = at.session_state.active_bank
+
+    def do_filter(self):
+        ms = self.at.multiselect[0]
+        opts = list(ms.options)
+        if len(opts) > 1:
+            ms.set_value(opts[:1]).run()
+            self.at.multiselect[0].set_value(opts).run()
+
+    def answer_current(self):
+        rnd = random.Random(self.sid * 7919 + len(self.latency["submit"]))
+        for r in self.at.radio:
+            if r.key and r.key.startswith("ans_"):
+                r.set_value(rnd.choice(r.options))
+                return
+        boxes = [c for c in self.at.checkbox if c.key and c.key.startswith("ans_")]
+        if boxes:
+            for c in rnd.sample(boxes, k=rnd.randint(1, len(boxes))):
+                c.check()
+            return
+        for t in self.at.text_input:
+            if t.key and t.key.startswith("ans_"):
+                t.input(rnd.choice(["A", "B", "AC"]))
+                return
+
+    def advance(self):
+        # what the auto-advance page reload does after a submit
+        self.at.query_params["advance"] = "1"
+        self.at.run()
+        self.at.query_params.clear()
+
+    def run(self):
+        self.timed("load", self.at.run)
+        self.timed("import", self.do_import)
+        self.timed("filter", self.do_filter)
+        for i in range(self.args.questions):
+            if not any(b.key and b.key.startswith("submit_") for b in self.at.button):
+                break
+            self.answer_current()
+            self.timed("submit", lambda: self.click(key_prefix="submit_"))
+            self.timed("advance", self.advance)
+            if i % 20 == 0:
+                self.timed("favorite", lambda: self.click(key_prefix="fav_add_"))
+        self.timed("export", lambda: self.click(label="导出收藏 (可再次导入)"))
+        return {"sid": self.sid, "bank": self.bank, "latency": dict(self.latency), "errors": self.errors}
+
+
+def run_one(sid, args, xlsx):
+    logging.disable(logging.WARNING)
+    # memory is sampled in the process that runs the session: in process mode the parent only waits on the pool;
+    # the app's imports load first, so growth is what the session itself holds on to
+    helpers = load_app_helpers(APP_FILE)
+    from streamlit.testing.v1 import AppTest  # noqa: F401
+    with RssWatch() as rss:
+        try:
+            result = Session(sid, args, xlsx, helpers).run()
+        except Exception as e:
+            result = {"sid": sid, "bank": None, "latency": {}, "errors": [f"harness: {type(e).__name__}: {e}"]}
+    result["rss"] = rss.as_dict()
+    return result
+
+
+def check_store(url, banks):
+    # every key must unpickle, every bank in the index must exist, and each session's bank should survive
+    helpers = load_app_helpers(APP_FILE)
+    backend = helpers.make_state_backend(url)
+    corrupt, missing = [], []
+    keys = list(helpers.STATE_KEYS) + [helpers.BANK_INDEX_KEY]
+    state = {}
+    for k in keys:
+        try:
+            state.update(backend.get_many([k]))
+        except Exception as e:
+            corrupt.append(f"{k}: {type(e).__name__}")
+    index = state.get(helpers.BANK_INDEX_KEY, [])
+    for name in index:
+        try:
+            if not backend.get_many([f"bank:{name}"]):
+                missing.append(name)
+        except Exception as e:
+            corrupt.append(f"bank:{name}: {type(e).__name__}")
+        for part in helpers.PER_BANK_KEYS:
+            try:
+                backend.get_many([f"{part}:{name}"])
+            except Exception as e:
+                corrupt.append(f"{part}:{name}: {type(e).__name__}")
+    if isinstance(backend, helpers.FileBackend):
+        for fn in os.listdir(backend.path):
+            if fn.endswith(".tmp"):
+                corrupt.append(f"leftover {fn}")
+    lost = [b for b in banks if b and b not in index]
+    return corrupt, missing, lost
+
+
+def main():
+    ap = argparse.ArgumentParser(description="concurrent-session load test for app_v20.py")
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--questions", type=int, default=200, help="questions answered per session")
+    ap.add_argument("--bank-size", type=int, default=2000)
+    ap.add_argument("--threads", action="store_true", help="interleave sessions on threads of one process")
+    ap.add_argument("--backend", default=None, help="ZEN_STATE_BACKEND url (default: file backend in a temp dir)")
+    ap.add_argument("--timeout", type=float, default=120)
+    args = ap.parse_args()
+
+    logging.disable(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="zen_loadtest_")
+    os.chdir(workdir)
+    os.environ.setdefault("ZEN_PARSE_CACHE_DIR", os.path.join(workdir, "parse_cache"))
+    os.environ["ZEN_STATE_BACKEND"] = args.backend or f"file://{os.path.join(workdir, 'state')}"
+    xlsx = make_bank_xlsx(args.bank_size)
+
+    if args.threads:
+        global RUN_LOCK
+        RUN_LOCK = threading.Lock()
+    pool_cls = concurrent.futures.ThreadPoolExecutor if args.threads else concurrent.futures.ProcessPoolExecutor
+    t0 = time.perf_counter()
+    with RssWatch() as parent, pool_cls(max_workers=args.sessions) as pool:
+        results = list(pool.map(run_one, range(args.sessions), [args] * args.sessions, [xlsx] * args.sessions))
+    wall = time.perf_counter() - t0
+
+    by_kind = defaultdict(list)
+    for r in results:
+        for kind, vals in r["latency"].items():
+            by_kind[kind].extend(vals)
+    all_lat = np.array([v for vals in by_kind.values() for v in vals])
+    errors = [e for r in results for e in r["errors"]]
+    corrupt, missing, lost = check_store(os.environ["ZEN_STATE_BACKEND"], [r["bank"] for r in results])
+
+    print(f"sessions={args.sessions} mode={'threads' if args.threads else 'processes'} "
+          f"backend={os.environ['ZEN_STATE_BACKEND']} workdir={workdir}")
+    print(f"interactions={len(all_lat)} wall={wall:.1f}s throughput={len(all_lat) / wall:.1f} interactions/s")
+    print(f"{'interaction':>12} {'n':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for kind, vals in sorted(by_kind.items()) + [("ALL", all_lat.tolist())]:
+        if not len(vals):
+            continue
+        p50, p95, p99 = np.percentile(vals, [50, 95, 99]) * 1000
+        print(f"{kind:>12} {len(vals):>6} {p50:>8.0f} {p95:>8.0f} {p99:>8.0f} {max(vals) * 1000:>8.0f}")
+    mb = 2 ** 20
+    if args.threads:
+        # sessions share this process, so only the process as a whole has a meaningful growth
+        print(f"rss start={parent.start / mb:.0f}MB end={parent.end / mb:.0f}MB peak={parent.peak / mb:.0f}MB "
+              f"growth={(parent.end - parent.start) / mb:+.0f}MB")
+    else:
+        growth = np.array([r["rss"]["end"] - r["rss"]["start"] for r in results]) / mb
+        for r in sorted(results, key=lambda r: r["sid"]):
+            m = r["rss"]
+            print(f"  session {r['sid']:>3} rss start={m['start'] / mb:.0f}MB end={m['end'] / mb:.0f}MB "
+                  f"peak={m['peak'] / mb:.0f}MB growth={(m['end'] - m['start']) / mb:+.0f}MB")
+        print(f"rss growth per session p50={np.median(growth):+.0f}MB max={growth.max():+.0f}MB "
+              f"total={growth.sum():+.0f}MB; largest session peak={max(r['rss']['peak'] for r in results) / mb:.0f}MB")
+    # lost banks are sessions whose import was overwritten by another session's last write of the shared index
+    print(f"errors={len(errors)} corrupt_keys={len(corrupt)} missing_banks={len(missing)} "
+          f"lost_session_banks={len(lost)}/{args.sessions}")
+    for line in (errors + corrupt)[:10]:
+        print("  " + line)
+    return 1 if errors or corrupt else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+# resp_standin.py
+# In-memory stand-in for a Redis server speaking RESP2, for exercising RedisBackend without a real Redis.
+# Implements only what the app sends: PING AUTH SELECT GET SET MGET DEL WATCH UNWATCH MULTI EXEC DISCARD.
+# usage: python resp_standin.py [--port 6379] [--password secret]
+
+import argparse
+import socket
+import socketserver
+import threading
+
+DB_COUNT = 16
+NIL_ARRAY = object()  # EXEC's reply when a watched key changed
+
+
+class Store:
+    def __init__(self, password=None):
+        self.password = password
+        self.dbs = [{} for _ in range(DB_COUNT)]
+        self.versions = {}  # (db, key) -> write counter, what WATCH compares at EXEC time
+        self.lock = threading.Lock()
+
+    def write(self, db, key, value):
+        if value is None:
+            self.dbs[db].pop(key, None)
+        else:
+            self.dbs[db][key] = value
+        self.versions[(db, key)] = self.versions.get((db, key), 0) + 1
+
+
+class Error(Exception):
+    pass
+
+
+def encode(reply):
+    if isinstance(reply, Error):
+        return b"-%s\r\n" % str(reply).encode()
+    if reply is None:
+        return b"$-1\r\n"
+    if reply is NIL_ARRAY:
+        return b"*-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(r) for r in reply)
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.store = self.server.store
+        self.authed = self.store.password is None
+        self.db, self.watched, self.queued = 0, {}, None
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:])):
+            n = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(n + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+            try:
+                reply = self.dispatch(args[0].decode().upper(), args[1:])
+            except Error as e:
+                reply = e
+            self.wfile.write(encode(reply))
+
+    def dispatch(self, cmd, args):
+        if cmd == "AUTH":
+            if self.store.password is None:
+                raise Error("ERR AUTH <password> called without any password configured for the default user")
+            self.authed = args[-1].decode() == self.store.password
+            if not self.authed:
+                raise Error("WRONGPASS invalid username-password pair or user is disabled.")
+            return "OK"
+        if not self.authed:
+            raise Error("NOAUTH Authentication required.")
+        if self.queued is not None and cmd not in ("EXEC", "DISCARD", "MULTI", "WATCH"):
+            self.queued.append((cmd, args))
+            return "QUEUED"
+        if cmd == "PING":
+            return "PONG"
+        if cmd == "SELECT":
+            db = int(args[0])
+            if not 0 <= db < DB_COUNT:
+                raise Error("ERR DB index is out of range")
+            self.db = db
+            return "OK"
+        if cmd == "MULTI":
+            if self.queued is not None:
+                raise Error("ERR MULTI calls can not be nested")
+            self.queued = []
+            return "OK"
+        if cmd == "DISCARD":
+            self.queued, self.watched = None, {}
+            return "OK"
+        with self.store.lock:
+            if cmd == "WATCH":
+                if self.queued is not None:
+                    raise Error("ERR WATCH inside MULTI is not allowed")
+                for k in args:
+                    self.watched[(self.db, k)] = self.store.versions.get((self.db, k), 0)
+                return "OK"
+            if cmd == "UNWATCH":
+                self.watched = {}
+                return "OK"
+            if cmd == "EXEC":
+                if self.queued is None:
+                    raise Error("ERR EXEC without MULTI")
+                queued, watched = self.queued, self.watched
+                self.queued, self.watched = None, {}
+                if any(self.store.versions.get(k, 0) != v for k, v in watched.items()):
+                    return NIL_ARRAY
+                out = []
+                for c, a in queued:
+                    try:
+                        out.append(self.run(c, a))
+                    except Error as e:
+                        out.append(e)
+                return out
+            return self.run(cmd, args)
+
+    def run(self, cmd, args):
+        data = self.store.dbs[self.db]
+        if cmd == "GET":
+            return data.get(args[0])
+        if cmd == "MGET":
+            return [data.get(k) for k in args]
+        if cmd == "SET":
+            self.store.write(self.db, args[0], args[1])
+            return "OK"
+        if cmd == "DEL":
+            hit = [k for k in args if k in data]
+            for k in hit:
+                self.store.write(self.db, k, None)
+            return len(hit)
+        raise Error(f"ERR unknown command '{cmd.lower()}'")
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, addr, password=None):
+        super().__init__(addr, Handler)
+        self.store = Store(password)
+
+
+def serve_background(host="127.0.0.1", port=0, password=None):
+    # port 0 picks a free port; read it back from server.server_address
+    server = Server((host, port), password)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    ap = argparse.ArgumentParser(description="in-memory RESP2 stand-in for a Redis server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=6379)
+    ap.add_argument("--password", default=None)
+    args = ap.parse_args()
+    with Server((args.host, args.port), args.password) as server:
+        print(f"listening on {args.host}:{server.server_address[1]}")
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
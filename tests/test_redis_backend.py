@@ -0,0 +1,87 @@
+# Drives RedisBackend against the in-memory RESP stand-in: batched get/set/delete, AUTH, SELECT and update().
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resp_standin  # noqa: E402
+from app_loader import load_app_helpers  # noqa: E402
+
+helpers = load_app_helpers()
+
+
+@pytest.fixture
+def server():
+    srv = resp_standin.serve_background(password="s3cret")
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def backend(server, db=0, password="s3cret", **kw):
+    host, port = server.server_address
+    return helpers.RedisBackend(host, port, db=db, password=password, **kw)
+
+
+def test_set_get_delete_many(server):
+    be = backend(server)
+    data = {"bank:a": [{"question": "题一", "answer": "A"}], "progress:a": {"history": {0: "A"}}, "active_bank": "a"}
+    be.set_many(data)
+    assert be.get_many(list(data) + ["missing"]) == data
+    be.delete_many(["bank:a", "missing"])
+    assert be.get_many(list(data)) == {k: v for k, v in data.items() if k != "bank:a"}
+    assert be.get_many([]) == {}
+    be.set_many({})
+    be.delete_many([])
+
+
+def test_url_with_password_and_db(server):
+    host, port = server.server_address
+    be = helpers.make_state_backend(f"redis://:s3cret@{host}:{port}/3")
+    assert (be.db, be.password) == (3, "s3cret")
+    be.set_many({"k": 1})
+    assert be.get_many(["k"]) == {"k": 1}
+
+
+def test_auth_required_and_rejected(server):
+    with pytest.raises(RuntimeError, match="NOAUTH"):
+        backend(server, password=None).get_many(["k"])
+    with pytest.raises(RuntimeError, match="WRONGPASS"):
+        backend(server, password="wrong").get_many(["k"])
+
+
+def test_select_isolates_databases(server):
+    db0, db5 = backend(server), backend(server, db=5)
+    db0.set_many({"k": "zero"})
+    db5.set_many({"k": "five"})
+    assert db0.get_many(["k"]) == {"k": "zero"}
+    assert db5.get_many(["k"]) == {"k": "five"}
+    db5.delete_many(["k"])
+    assert db0.get_many(["k"]) == {"k": "zero"}
+
+
+def test_pooled_connections_are_reused(server):
+    be = backend(server, db=2, pool_size=2)
+    for i in range(20):
+        be.set_many({f"k{i}": i})
+    assert be._pool.qsize() == 1
+    assert be.get_many([f"k{i}" for i in range(20)]) == {f"k{i}": i for i in range(20)}
+
+
+def test_update_retries_until_no_lost_writes(server):
+    be = backend(server, pool_size=8)
+
+    def add(n):
+        for i in range(25):
+            be.update(helpers.BANK_INDEX_KEY, lambda cur: (cur or []) + [f"{n}-{i}"])
+
+    threads = [threading.Thread(target=add, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(be.get_many([helpers.BANK_INDEX_KEY])[helpers.BANK_INDEX_KEY]) == 150